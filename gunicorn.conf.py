@@ -0,0 +1,32 @@
+"""
+Configuracion de gunicorn. Se carga sola porque gunicorn busca gunicorn.conf.py
+en el directorio desde el que se ejecuta (la raiz del proyecto en el Procfile).
+Todo se ajusta con variables de entorno, ver "Modo de alta concurrencia" en el README:
+
+    WEB_WORKER_CLASS=sync     un proceso atiende una solicitud a la vez (por defecto)
+    WEB_WORKER_CLASS=gthread  WEB_THREADS hilos por proceso
+    WEB_WORKER_CLASS=gevent   hasta WEB_WORKER_CONNECTIONS solicitudes por proceso
+"""
+import os
+
+worker_class = os.getenv("WEB_WORKER_CLASS", "sync")
+# Heroku y Render definen WEB_CONCURRENCY segun la memoria del dyno/instancia
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("WEB_THREADS", "8" if worker_class == "gthread" else "1"))
+worker_connections = int(os.getenv("WEB_WORKER_CONNECTIONS", "1000"))
+timeout = int(os.getenv("WEB_TIMEOUT", "30"))
+keepalive = int(os.getenv("WEB_KEEPALIVE", "5"))
+
+
+def post_fork(server, worker):
+    # Con gevent, psycopg2 debe ceder el control mientras espera a PostgreSQL;
+    # sin este parche cada consulta bloquea a todas las solicitudes del proceso
+    if worker_class != "gevent":
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning(
+            "psycogreen no está instalado: las consultas a PostgreSQL bloquearán el worker gevent")
+    else:
+        patch_psycopg()
@@ -0,0 +1,60 @@
+"""add indexes for foreign keys and lookup columns
+
+Revision ID: 7c1f3a9d2b64
+Revises: d2b85934317b
+Create Date: 2025-06-02 10:12:44.381920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1f3a9d2b64'
+down_revision = 'd2b85934317b'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_users_role_status', 'users', ['role', 'status']),
+    ('ix_users_status', 'users', ['status']),
+    ('ix_medical_files_user_id', 'medical_files', ['user_id']),
+    ('ix_medical_files_created_at', 'medical_files', ['created_at']),
+    ('ix_medical_files_created_by_status', 'medical_files', ['created_by', 'status']),
+    ('ix_medical_files_supervised_by_status', 'medical_files', ['supervised_by', 'status']),
+    ('ix_personal_data_medical_file_id', 'personal_data', ['medical_file_id']),
+    ('ix_pathological_background_medical_file_id', 'pathological_background', ['medical_file_id']),
+    ('ix_family_background_medical_file_id', 'family_background', ['medical_file_id']),
+    ('ix_gynecological_background_medical_file_id', 'gynecological_background', ['medical_file_id']),
+    ('ix_non_pathological_background_medical_file_id', 'non_pathological_background', ['medical_file_id']),
+]
+
+
+def _is_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    # En Postgres los índices se crean con CONCURRENTLY para no bloquear
+    # escrituras; eso exige ejecutarlos fuera de la transacción de la migración.
+    if _is_postgres():
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False,
+                                postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            if_not_exists=True)
+
+
+def downgrade():
+    if _is_postgres():
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table,
+                              postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True)
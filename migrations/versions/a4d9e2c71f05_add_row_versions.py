@@ -0,0 +1,38 @@
+"""add version columns for optimistic concurrency
+
+Revision ID: a4d9e2c71f05
+Revises: 7c1f3a9d2b64
+Create Date: 2025-06-04 17:40:02.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e2c71f05'
+down_revision = '7c1f3a9d2b64'
+branch_labels = None
+depends_on = None
+
+
+TABLES = [
+    'medical_files',
+    'personal_data',
+    'pathological_background',
+    'family_background',
+    'gynecological_background',
+    'non_pathological_background',
+]
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version')
@@ -0,0 +1,67 @@
+"""add full-text search documents for medical files
+
+Revision ID: c5e27f8a6d13
+Revises: b81e4c0d9a37
+Create Date: 2025-06-09 11:04:52.318640
+
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e27f8a6d13'
+down_revision = 'b81e4c0d9a37'
+branch_labels = None
+depends_on = None
+
+# Columnas de texto libre que forman el documento de cada expediente
+SEARCH_SOURCES = {
+    'pathological_background': [
+        'personal_diseases', 'medications', 'hospitalizations', 'surgeries',
+        'traumatisms', 'transfusions', 'allergies', 'others'],
+    'non_pathological_background': [
+        'education_level', 'economic_activity', 'marital_status', 'dependents',
+        'occupation', 'recent_travels', 'social_activities', 'exercise',
+        'diet_supplements', 'hygiene', 'hobbies', 'tobacco_use', 'alcohol_use',
+        'recreational_drugs', 'addictions', 'otherS'],
+}
+
+
+def upgrade():
+    search = op.create_table('medical_file_search',
+    sa.Column('medical_file_id', sa.Integer(), nullable=False),
+    sa.Column('document', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['medical_file_id'], ['medical_files.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('medical_file_id')
+    )
+    with op.batch_alter_table('medical_file_search', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_medical_file_search_updated_at'), ['updated_at'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE INDEX ix_medical_file_search_document ON medical_file_search "
+                   "USING gin (to_tsvector('spanish', document))")
+
+    # Documentos de los expedientes existentes
+    texts = {}
+    for table_name, columns in SEARCH_SOURCES.items():
+        table = sa.table(table_name, sa.column('medical_file_id'), *(sa.column(name) for name in columns))
+        for file_id, *values in bind.execute(sa.select(table.c.medical_file_id, *(table.c[name] for name in columns))):
+            texts.setdefault(file_id, []).extend(value for value in values if value)
+    now = datetime.now(timezone.utc)
+    rows = [{'medical_file_id': file_id, 'document': ' '.join(parts), 'updated_at': now}
+            for file_id, parts in texts.items() if parts]
+    if rows:
+        op.bulk_insert(search, rows)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_medical_file_search_document")
+    with op.batch_alter_table('medical_file_search', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_medical_file_search_updated_at'))
+
+    op.drop_table('medical_file_search')
@@ -0,0 +1,77 @@
+"""add pre-aggregated family background cohort statistics
+
+Revision ID: d3a61b9f4e28
+Revises: c5e27f8a6d13
+Create Date: 2025-06-12 16:47:05.902113
+
+"""
+from collections import Counter
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3a61b9f4e28'
+down_revision = 'c5e27f8a6d13'
+branch_labels = None
+depends_on = None
+
+# Copia de api/stats.py al momento de la migracion
+FLAGS = ('hypertension', 'diabetes', 'cancer', 'heart_disease', 'kidney_disease',
+         'liver_disease', 'mental_illness', 'congenital_malformations')
+AGE_BANDS = ((0, '0-17'), (18, '18-29'), (30, '30-44'), (45, '45-59'), (60, '60-74'), (75, '75+'))
+
+
+def _age_band(birth_date, created_at):
+    if birth_date is None:
+        return 'sin_dato'
+    at = created_at.date() if created_at is not None else date.today()
+    age = at.year - birth_date.year - ((at.month, at.day) < (birth_date.month, birth_date.day))
+    return [label for minimum, label in AGE_BANDS if age >= minimum][-1] if age >= 0 else AGE_BANDS[0][1]
+
+
+def upgrade():
+    profiles = op.create_table('family_risk_profiles',
+    sa.Column('medical_file_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('sex', sa.String(length=20), nullable=False),
+    sa.Column('age_band', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('flags', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('medical_file_id')
+    )
+    stats = op.create_table('family_risk_stats',
+    sa.Column('sex', sa.String(length=20), nullable=False),
+    sa.Column('age_band', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('flags', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('sex', 'age_band', 'status', 'flags')
+    )
+
+    # Perfiles y conteos de los expedientes existentes
+    files = sa.table('medical_files', sa.column('id'), sa.column('status', sa.String()),
+                     sa.column('created_at', sa.DateTime()))
+    personal = sa.table('personal_data', sa.column('medical_file_id'), sa.column('sex', sa.String()),
+                        sa.column('birth_date', sa.Date()))
+    family = sa.table('family_background', sa.column('medical_file_id'), *(sa.column(name) for name in FLAGS))
+    stmt = (sa.select(files.c.id, files.c.status, files.c.created_at, personal.c.sex,
+                      personal.c.birth_date, *(family.c[name] for name in FLAGS))
+            .select_from(files.join(family, family.c.medical_file_id == files.c.id)
+                         .outerjoin(personal, personal.c.medical_file_id == files.c.id)))
+    profile_rows = []
+    for file_id, status, created_at, sex, birth_date, *flags in op.get_bind().execute(stmt):
+        mask = sum(1 << bit for bit, value in enumerate(flags) if value)
+        profile_rows.append({'medical_file_id': file_id, 'sex': sex or 'sin_dato',
+                             'age_band': _age_band(birth_date, created_at),
+                             'status': status or 'sin_dato', 'flags': mask})
+    if profile_rows:
+        op.bulk_insert(profiles, profile_rows)
+        counts = Counter((row['sex'], row['age_band'], row['status'], row['flags']) for row in profile_rows)
+        op.bulk_insert(stats, [{'sex': sex, 'age_band': band, 'status': status, 'flags': mask, 'total': total}
+                               for (sex, band, status, mask), total in counts.items()])
+
+
+def downgrade():
+    op.drop_table('family_risk_stats')
+    op.drop_table('family_risk_profiles')
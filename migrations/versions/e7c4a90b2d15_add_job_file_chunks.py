@@ -0,0 +1,30 @@
+"""store job output files in the database
+
+Revision ID: e7c4a90b2d15
+Revises: d3a61b9f4e28
+Create Date: 2025-06-16 10:12:44.318027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c4a90b2d15'
+down_revision = 'd3a61b9f4e28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_file_chunks',
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('job_id', 'seq')
+    )
+
+
+def downgrade():
+    op.drop_table('job_file_chunks')
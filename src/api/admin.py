@@ -1,7 +1,9 @@
-  
+
 import os
 from flask_admin import Admin
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import func, text
+from sqlalchemy.orm import Query, selectinload, scoped_session
 from .models import (
     db,
     User,
@@ -10,54 +12,140 @@ from .models import (
     PathologicalBackground,
     FamilyBackground,
     GynecologicalBackground,
-    NonPathologicalBackground
+    NonPathologicalBackground,
+    Job
 )
 
-class UserView(ModelView):
+# A partir de cuantas filas (segun las estadisticas de PostgreSQL) se muestra el
+# total estimado en lugar de hacer COUNT(*) sobre toda la tabla
+ADMIN_ESTIMATE_COUNT_ABOVE = int(os.getenv("ADMIN_ESTIMATE_COUNT_ABOVE", "100000"))
+
+
+def estimated_row_count(session, table_name):
+    # reltuples lo actualizan ANALYZE/autovacuum; -1 si la tabla nunca se analizó
+    if session.get_bind().dialect.name != "postgresql":
+        return None
+    estimate = session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": table_name}).scalar()
+    return estimate if estimate is not None and estimate >= ADMIN_ESTIMATE_COUNT_ABOVE else None
+
+
+class EstimatedCountQuery(Query):
+    """COUNT(*) de la lista: sin busqueda ni filtros usa la estimacion de la tabla."""
+
+    def scalar(self):
+        if self.whereclause is None:
+            estimate = estimated_row_count(self.session, self._estimate_table)
+            if estimate is not None:
+                return estimate
+        return super().scalar()
+
+
+def related_ids(view, context, model, name):
+    # Las relaciones se muestran como ids en lugar del repr del objeto
+    value = getattr(model, name)
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return ", ".join(f"#{item.id}" for item in value)
+    return f"#{value.id}"
+
+
+class BaseModelView(ModelView):
+    """
+    Vista de lista con paginas cortas, orden por columnas indexadas y las
+    relaciones de la lista cargadas de antemano (list_load_options) en lugar
+    de una consulta por fila y relacion.
+    """
+    page_size = 50
+    can_set_page_size = True
+    page_size_options = (20, 50, 100)
+    column_default_sort = ("id", True)
+    list_load_options = ()
+
+    def get_query(self):
+        return super().get_query().options(*self.list_load_options)
+
+    def get_count_query(self):
+        session = self.session() if isinstance(self.session, scoped_session) else self.session
+        query = EstimatedCountQuery([func.count("*")], session).select_from(self.model)
+        query._estimate_table = self.model.__tablename__
+        return query
+
+
+class UserView(BaseModelView):
     column_list = [
         "id", "email", "role", "status",
         "medical_file", "student_medical_files", "password"
     ]
+    column_sortable_list = ["id", "email", "role", "status"]
+    column_formatters = {"medical_file": related_ids, "student_medical_files": related_ids}
+    list_load_options = (
+        selectinload(User.medical_file),
+        selectinload(User.student_medical_files),
+    )
 
-class MedicalFileView(ModelView):
+class MedicalFileView(BaseModelView):
     column_list = [
         "id", "status", "created_at", "created_by", "user_id",
         "creator", "user",
         "gynecological_background", "non_pathological_background",
         "family_background", "pathological_background", "personal_data"
     ]
+    column_sortable_list = ["id", "created_at", "created_by", "user_id"]
+    column_formatters = {name: related_ids for name in (
+        "creator", "user", "gynecological_background", "non_pathological_background",
+        "family_background", "pathological_background", "personal_data")}
+    # selectinload en lugar de JOINs: el OFFSET de las paginas profundas recorre
+    # solo el indice de medical_files y cada relacion es un IN con los ids de la pagina
+    list_load_options = (
+        selectinload(MedicalFile.creator),
+        selectinload(MedicalFile.user),
+        selectinload(MedicalFile.gynecological_background),
+        selectinload(MedicalFile.non_pathological_background),
+        selectinload(MedicalFile.family_background),
+        selectinload(MedicalFile.pathological_background),
+        selectinload(MedicalFile.personal_data),
+    )
+    # Sin los joinedload automaticos de Flask-Admin para creator/user
+    column_auto_select_related = False
 
-class PersonalDataView(ModelView):
+class PersonalDataView(BaseModelView):
     column_list = [
         "id", "user_id", "medical_file_id",
         "full_name", "paternal_surname", "maternal_surname",
         "sex", "birth_date", "address", "phone"
     ]
+    column_sortable_list = ["id", "user_id", "medical_file_id"]
 
-class PathologicalBackgroundView(ModelView):
+class PathologicalBackgroundView(BaseModelView):
     column_list = [
         "id", "user_id", "medical_file_id",
         "personal_diseases", "medications", "hospitalizations",
         "surgeries", "traumatisms", "transfusions",
         "allergies", "others"
     ]
+    column_sortable_list = ["id", "user_id", "medical_file_id"]
 
-class FamilyBackgroundView(ModelView):
+class FamilyBackgroundView(BaseModelView):
     column_list = [
         "id", "user_id", "medical_file_id",
         "hypertension", "diabetes", "cancer",
         "heart_disease", "kidney_disease", "liver_disease",
         "mental_illness", "congenital_malformations"
     ]
+    column_sortable_list = ["id", "user_id", "medical_file_id"]
 
-class GynecologicalBackgroundView(ModelView):
+class GynecologicalBackgroundView(BaseModelView):
     column_list = [
         "id", "user_id", "medical_file_id",
         "menarche_age", "pregnancies", "births",
         "c_sections", "abortions", "contraceptive_method"
     ]
+    column_sortable_list = ["id", "user_id", "medical_file_id"]
 
-class NonPathologicalBackgroundView(ModelView):
+class NonPathologicalBackgroundView(BaseModelView):
     column_list = [
         "id", "user_id", "medical_file_id",
         "education_level", "economic_activity", "marital_status",
@@ -67,6 +155,14 @@ class NonPathologicalBackgroundView(ModelView):
         "tobacco_use", "alcohol_use", "recreational_drugs",
         "addictions", "other"
     ]
+    column_sortable_list = ["id", "user_id", "medical_file_id"]
+
+class JobView(BaseModelView):
+    column_list = [
+        "id", "kind", "status", "attempts", "created_by",
+        "created_at", "started_at", "finished_at", "error"
+    ]
+    column_sortable_list = ["id", "status", "created_by"]
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
@@ -82,4 +178,5 @@ def setup_admin(app):
     admin.add_view(GynecologicalBackgroundView(GynecologicalBackground, db.session))
     admin.add_view(NonPathologicalBackgroundView(NonPathologicalBackground, db.session))
 
-    
\ No newline at end of file
+
+    admin.add_view(JobView(Job, db.session))
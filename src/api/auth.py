@@ -0,0 +1,134 @@
+"""
+Resolucion del usuario actual para las rutas protegidas con JWT.
+El rol y el estado viajan como claims en el token para que las comprobaciones
+de permisos no necesiten consultar la base de datos. El usuario (`current_user`)
+se carga solo si la vista lo usa, una vez por solicitud (se guarda en `g`), y
+ademas se guarda en una cache LRU local al proceso con TTL corto.
+"""
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import g, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import event
+from werkzeug.local import LocalProxy
+from api.models import db, User, UserRole
+from api.utils import APIException
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+
+class TTLCache:
+    """LRU acotada por tamaño en la que cada entrada expira tras `ttl` segundos."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+def token_claims(user):
+    # Claims adicionales del access token
+    return {"role": user.role.value, "status": user.status.value}
+
+
+def load_user(user_id):
+    """
+    Devuelve el User asociado a la sesion de la solicitud actual.
+    En la cache se guardan instancias desacopladas; merge(load=False) las copia
+    a la sesion sin emitir SQL.
+    """
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return db.session.merge(cached, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is None or not user_cache.enabled:
+        return user
+
+    db.session.expunge(user)
+    user_cache.set(user_id, user)
+    return db.session.merge(user, load=False)
+
+
+def get_current_user():
+    """Usuario del token de la solicitud; 404 si ya no existe."""
+    if "_current_user" not in g:
+        user = load_user(int(get_jwt_identity()))
+        if user is None:
+            raise APIException("Usuario no encontrado", status_code=404)
+        g._current_user = user
+    return g._current_user
+
+
+# Sustituye a flask_jwt_extended.current_user: sin user_lookup_loader la
+# consulta solo ocurre en las vistas que leen el usuario
+current_user = LocalProxy(get_current_user)
+
+
+def current_role():
+    # Los tokens emitidos antes de incluir el claim "role" usan el usuario cargado
+    role = get_jwt().get("role")
+    if role is None:
+        return current_user.role
+    return UserRole(role)
+
+
+def require_metrics_token():
+    # Las métricas exponen hosts de la base y tiempos por ruta: se exige la cabecera
+    # X-Metrics-Token (si METRICS_TOKEN está configurado) o un JWT de administrador.
+    # Sin ninguno de los dos se niega el acceso, también cuando no hay METRICS_TOKEN
+    token = os.getenv("METRICS_TOKEN")
+    supplied = request.headers.get("X-Metrics-Token")
+    if token and supplied is not None and hmac.compare_digest(supplied, token):
+        return
+    if verify_jwt_in_request(optional=True) is not None and current_role() == UserRole.admin:
+        return
+    raise APIException("Acceso no autorizado", status_code=403)
+
+
+# Invalida la cache cuando un usuario cambia o se elimina en este proceso
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.pop(target.id)
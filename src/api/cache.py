@@ -0,0 +1,274 @@
+"""
+Cache de respuestas del blueprint `api` con invalidacion por etiquetas.
+Las vistas decoradas con @cached(...) guardan su respuesta 200 bajo una clave
+formada por la ruta, los parametros de la URL, el usuario y su rol. Cada entrada
+lleva etiquetas ("users", "medical_file:12"...) con la version que tenian al
+calcularla; un commit que cambia filas de esas tablas sube la version de sus
+etiquetas (eventos de la sesion) y las entradas con una version vieja dejan de
+servirse. Tomar las versiones antes de ejecutar la vista evita guardar como
+vigente una respuesta calculada mientras otro commit la invalidaba. Con replicas
+de lectura, la vista de un fallo lee de la base principal: una replica atrasada
+daria una respuesta anterior al commit guardada con las versiones nuevas.
+
+Etiquetas por tabla (T) y por fila (T:<id>); los cambios del ORM suben T y
+T:<id>, y los INSERT/UPDATE/DELETE de Core, que no dicen que filas tocaron,
+suben T y T:*. Una entrada que depende de una fila concreta lleva T:<id> y T:*.
+
+Backends (CACHE_STORAGE_URL):
+- vacio o memory://  LRU en memoria del proceso con TTL y limite de entradas y
+                     bytes; la invalidacion solo llega a ese proceso, asi que
+                     sirve con un solo proceso (sin `flask worker` aparte)
+- redis://...        Redis compartido por workers, maquinas y `flask worker`
+                     (requiere el paquete redis)
+El cache esta desactivado salvo CACHE_ENABLED=true.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, current_app
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from api.database import use_primary
+from api.metrics import registry
+from api.models import (
+    db,
+    User,
+    MedicalFile,
+    PersonalData,
+    PathologicalBackground,
+    FamilyBackground,
+    GynecologicalBackground,
+    NonPathologicalBackground
+)
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "false").strip().lower() in ("1", "true", "yes", "on")
+CACHE_STORAGE_URL = os.getenv("CACHE_STORAGE_URL", "")
+CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+BACKGROUND_MODELS = (PersonalData, PathologicalBackground, FamilyBackground,
+                     GynecologicalBackground, NonPathologicalBackground)
+# Tabla -> etiquetas que sube un INSERT/UPDATE/DELETE de Core sobre ella
+TABLE_TAGS = {
+    "users": ("users", "user:*"),
+    "medical_files": ("medical_files", "medical_file:*"),
+    "medical_file_search": ("backgrounds",),
+    "family_risk_profiles": ("backgrounds",),
+    "family_risk_stats": ("backgrounds",),
+}
+TABLE_TAGS.update({model.__tablename__: ("backgrounds", "medical_file:*") for model in BACKGROUND_MODELS})
+# Cabeceras que no se guardan con la respuesta
+SKIP_HEADERS = {"content-length", "set-cookie"}
+
+
+class MemoryBackend:
+    """LRU con TTL acotada por entradas y por bytes del cuerpo."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # clave -> (expira, entrada)
+        self._entries = OrderedDict()
+        self._versions = {}
+        self.size = 0
+
+    def versions(self, tags):
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def _remove(self, key):
+        _, entry = self._entries.pop(key)
+        self.size -= len(entry["body"])
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic() or any(
+                    self._versions.get(tag, 0) != version for tag, version in entry["tags"].items()):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        if len(entry["body"]) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, entry)
+            self.size += len(entry["body"])
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                registry.count("http_cache_evictions_total", ())
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.size = 0
+
+
+class RedisBackend:
+    """Entradas en JSON con expiracion de Redis; las versiones de etiquetas son contadores."""
+
+    def __init__(self, url, prefix="cache:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_STORAGE_URL usa Redis pero el paquete redis no está instalado")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = self._client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if self.versions(entry["tags"]) != entry["tags"]:
+            return None
+        entry["body"] = entry["body"].encode()
+        return entry
+
+    def set(self, key, entry, ttl):
+        self._client.set(self.prefix + key, json.dumps(dict(entry, body=entry["body"].decode())), ex=ttl)
+
+    def invalidate(self, tags):
+        pipeline = self._client.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(f"{self.prefix}tag:{tag}")
+        pipeline.execute()
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+def create_backend(url):
+    if not url or url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"CACHE_STORAGE_URL no soportada: {url}")
+
+
+backend = create_backend(CACHE_STORAGE_URL) if CACHE_ENABLED else None
+
+
+def _cache_key():
+    identity = get_jwt_identity()
+    role = get_jwt().get("role")
+    args = sorted(request.args.items(multi=True))
+    raw = json.dumps([request.endpoint, request.path, args, identity, role], separators=(",", ":"))
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def cached(*tags, ttl=None):
+    """
+    Cachea la respuesta 200 JSON de una vista protegida con JWT.
+    Las etiquetas pueden usar los argumentos de la ruta y el usuario:
+    @cached("medical_file:{file_id}", "medical_file:*", "users")
+    @cached("user:{user_id}", "user:*")
+    """
+    ttl = ttl or CACHE_DEFAULT_TTL
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Se consulta al ejecutar la vista: el backend puede cambiarse en las pruebas
+            if backend is None:
+                return view(*args, **kwargs)
+            route = request.url_rule.rule
+            key = _cache_key()
+            entry = backend.get(key)
+            if entry is not None:
+                registry.count("http_cache_requests_total", (("route", route), ("result", "hit")))
+                response = current_app.response_class(entry["body"], status=entry["status"],
+                                                      headers=entry["headers"])
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            registry.count("http_cache_requests_total", (("route", route), ("result", "miss")))
+            versions = backend.versions(
+                tag.format(user_id=get_jwt_identity(), **kwargs) for tag in tags)
+            use_primary(db.session)
+            response = make_response(view(*args, **kwargs))
+            if (response.status_code == 200 and response.mimetype == "application/json"
+                    and not response.is_streamed and "Set-Cookie" not in response.headers):
+                backend.set(key, {
+                    "status": response.status_code,
+                    "headers": [[name, value] for name, value in response.headers.items()
+                                if name.lower() not in SKIP_HEADERS],
+                    "body": response.get_data(),
+                    "tags": versions,
+                }, ttl)
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+# -------------------- INVALIDACION --------------------
+def _object_tags(obj):
+    if isinstance(obj, User):
+        return ("users", f"user:{obj.id}")
+    if isinstance(obj, MedicalFile):
+        return ("medical_files", f"medical_file:{obj.id}")
+    if isinstance(obj, BACKGROUND_MODELS):
+        return ("backgrounds", f"medical_file:{obj.medical_file_id}")
+    return ()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_object_tags(session, flush_context):
+    if backend is None:
+        return
+    pending = session.info.setdefault("cache_tags", set())
+    for obj in session.new | session.dirty | session.deleted:
+        pending.update(_object_tags(obj))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_tags(orm_execute_state):
+    if backend is None or orm_execute_state.is_select:
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    tags = TABLE_TAGS.get(getattr(table, "name", None))
+    if tags:
+        orm_execute_state.session.info.setdefault("cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    tags = session.info.pop("cache_tags", None)
+    if tags and backend is not None:
+        backend.invalidate(tags)
+        registry.count("http_cache_invalidations_total", (), len(tags))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("cache_tags", None)
@@ -1,6 +1,21 @@
 
+import sys
+import time
 import click
-from api.models import db, User
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select
+from api.models import db, User, UserRole, UserStatus, FileStatus, MedicalFile, PathologicalBackground
+from api.queries import medical_files_query, medical_file_filters, role_medical_files_query, explain
+from api.passwords import hashes_per_second, method_prefix, PASSWORD_HASH_METHOD
+from api.seed import seed_database, SEED_CHUNK_SIZE
+from api.export import iter_medical_file_records, iter_ndjson, EXPORT_BATCH_SIZE
+from api.schemas import SECTION_SCHEMAS, MEDICAL_FILE_SCHEMA
+from api.jobs import run_worker, JOB_CONCURRENCY, JOB_POLL_INTERVAL
+from api.loadtest import run_load_test, login_token
+from api.static_assets import compress_assets, COMPRESS_MIN_SIZE
+from api.json_provider import JSONProvider, StdlibJSONProvider
+from api.search import rebuild_documents
+from api.stats import rebuild_family_stats
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -9,26 +24,262 @@ with youy database, for example: Import the price of bitcoin every night as 12am
 """
 def setup_commands(app):
     
-    """ 
-    This is an example command "insert-test-users" that you can run from the command line
-    by typing: $ flask insert-test-users 5
-    Note: 5 is the number of users to add
-    """
-    @app.cli.command("insert-test-users") # name of our command
-    @click.argument("count") # argument of out command
-    def insert_test_users(count):
-        print("Creating test users")
-        for x in range(1, int(count) + 1):
-            user = User()
-            user.email = "test_user" + str(x) + "@test.com"
-            user.password = "123456"
-            user.is_active = True
-            db.session.add(user)
-            db.session.commit()
-            print("User: ", user.email, " created.")
-
-        print("All test users created")
+    """
+    Genera usuarios de todos los roles y un expediente completo por paciente,
+    con inserciones por lotes y una semilla fija para obtener siempre los mismos datos:
+    $ flask seed-data --users 100000 --seed 42
+    Todos los usuarios creados tienen la contraseña indicada en --password.
+    """
+    @app.cli.command("seed-data")
+    @click.option("--users", "total_users", type=click.IntRange(1), default=1000)
+    @click.option("--seed", type=int, default=42)
+    @click.option("--chunk-size", type=click.IntRange(1), default=SEED_CHUNK_SIZE)
+    @click.option("--password", default="123456")
+    def seed_data(total_users, seed, chunk_size, password):
+        start = time.perf_counter()
+        counts = seed_database(db.session, total_users, seed, chunk_size, password)
+        elapsed = time.perf_counter() - start
+        print(f"{sum(counts.values())} usuarios creados en {elapsed:.1f} s: {counts}")
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    """
+    Exporta todos los expedientes con sus antecedentes en formato NDJSON:
+    $ flask export-medical-files --output expedientes.ndjson
+    Sin --output escribe en la salida estandar.
+    """
+    @app.cli.command("export-medical-files")
+    @click.option("--output", type=click.Path(dir_okay=False, writable=True), default=None)
+    @click.option("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    def export_medical_files(output, batch_size):
+        stream = open(output, "wb") if output else sys.stdout.buffer
+        count = 0
+        try:
+            for line in iter_ndjson(iter_medical_file_records(db.session, batch_size)):
+                stream.write(line)
+                count += 1
+        finally:
+            if output:
+                stream.close()
+        print(f"{count} expedientes exportados", file=sys.stderr)
+
+    """
+    Muestra el plan de ejecucion y el tiempo de las consultas mas frecuentes de la API.
+    Ejecutalo antes y despues de `flask db upgrade` sobre una base con datos para
+    comparar los planes con y sin indices:
+    $ flask explain-queries --analyze
+    """
+    @app.cli.command("explain-queries")
+    @click.option("--analyze", is_flag=True, help="Ejecuta EXPLAIN ANALYZE en Postgres")
+    @click.option("--repeat", type=int, default=5, help="Repeticiones para medir el tiempo")
+    def explain_queries(analyze, repeat):
+        professional_id = db.session.scalar(
+            select(User.id).where(User.role == UserRole.profesional).limit(1)) or 1
+        medical_file_id = db.session.scalar(select(MedicalFile.id).limit(1)) or 1
+
+        statements = [
+            ("Expedientes de un profesional (propios, creados y supervisados)",
+             role_medical_files_query(professional_id, UserRole.profesional)),
+            ("Expedientes en revision supervisados por un profesional (administrador)",
+             medical_files_query().where(*medical_file_filters(
+                 status=FileStatus.revision, supervised_by=professional_id))
+             .order_by(MedicalFile.id.desc()).limit(50)),
+            ("Antecedentes de un expediente",
+             select(PathologicalBackground).where(
+                 PathologicalBackground.medical_file_id == medical_file_id)),
+            ("Usuarios por rol y estado",
+             select(User).where(User.role == UserRole.estudiante,
+                                User.status == UserStatus.aprobado)
+             .order_by(User.id).limit(50)),
+        ]
+
+        for title, stmt in statements:
+            print(f"== {title}")
+            for line in explain(db.session, stmt, analyze):
+                print("   ", line)
+            start = time.perf_counter()
+            for _ in range(repeat):
+                db.session.execute(stmt).all()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"    tiempo medio: {elapsed:.2f} ms\n")
+
+    """
+    Mide cuantos hashes de contraseña por segundo y por nucleo permite un metodo,
+    para elegir PASSWORD_HASH_METHOD segun la capacidad de los servidores:
+    $ flask bench-password-hash --method scrypt --method pbkdf2:sha256:600000 --processes 4
+    """
+    @app.cli.command("bench-password-hash")
+    @click.option("--method", "methods", multiple=True)
+    @click.option("--seconds", type=float, default=2.0)
+    @click.option("--processes", type=click.IntRange(1), default=1)
+    def bench_password_hash(methods, seconds, processes):
+        for method in methods or (PASSWORD_HASH_METHOD,):
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                rates = list(pool.map(hashes_per_second,
+                                      [method] * processes, [seconds] * processes))
+            per_core = sum(rates) / len(rates)
+            print(f"{method_prefix(method)}: {per_core:.1f} hashes/s por nucleo, "
+                  f"{sum(rates):.1f} hashes/s con {processes} procesos")
+
+    """
+    Mide cuanto cuesta validar el payload de POST /api/medical-file con el
+    esquema compilado, para un payload valido y uno con errores en cada seccion:
+    $ flask bench-validation --iterations 100000
+    """
+    @app.cli.command("bench-validation")
+    @click.option("--iterations", type=click.IntRange(1), default=100000)
+    def bench_validation(iterations):
+        text = "Ninguno"
+        valid = {
+            "user_id": 1, "created_by": 2, "supervised_by": 3,
+            "personal_data": {"full_name": "Juan Perez", "paternal_surname": "Perez",
+                              "maternal_surname": "Gomez", "sex": "femenino",
+                              "birth_date": "1990-01-01", "address": "Calle Falsa 123",
+                              "phone": "123456789"},
+            "pathological": {key: text for key in SECTION_SCHEMAS["pathological"].fields},
+            "family": dict({key: False for key in SECTION_SCHEMAS["family"].fields}, others=text),
+            "non_pathological": dict(
+                {key: text for key in SECTION_SCHEMAS["non_pathological"].fields},
+                dependents=0, tattoos=False, piercings=False, tobacco_use=False),
+            "gynecological": {"menarche_age": 12, "pregnancies": 0, "births": 0,
+                              "c_sections": 0, "abortions": 0,
+                              "contraceptive_method": text, "others": text},
+        }
+        invalid = {key: dict(value, unknown=1) if isinstance(value, dict) else "x"
+                   for key, value in valid.items()}
+
+        for name, payload in (("valido", valid), ("invalido", invalid)):
+            _, errors = MEDICAL_FILE_SCHEMA.validate(payload)
+            start = time.perf_counter()
+            for _ in range(iterations):
+                MEDICAL_FILE_SCHEMA.validate(payload)
+            elapsed = (time.perf_counter() - start) / iterations * 1e6
+            print(f"payload {name}: {elapsed:.1f} µs por validacion "
+                  f"({len(errors)} campos con error)")
+
+    """
+    Ejecuta los trabajos en segundo plano encolados por la API (borrados en
+    cascada, cargas masivas y exportaciones) con un pool de hilos.
+    Se pueden correr varios workers a la vez; --once termina al vaciar la cola:
+    $ flask worker --concurrency 4
+    """
+    @app.cli.command("worker")
+    @click.option("--concurrency", type=click.IntRange(1), default=JOB_CONCURRENCY)
+    @click.option("--poll-interval", type=float, default=JOB_POLL_INTERVAL)
+    @click.option("--once", is_flag=True)
+    def worker(concurrency, poll_interval, once):
+        print(f"Worker iniciado con {concurrency} hilos")
+        run_worker(app, concurrency, poll_interval, once)
+
+    """
+    Prueba de carga contra un servidor en marcha: N clientes concurrentes
+    repiten un GET y se reportan solicitudes por segundo y latencia p50/p95/p99.
+    Con --email/--password primero se inicia sesion para enviar el JWT:
+    $ flask load-test --url http://localhost:3001/api/medical_files --clients 200 \
+        --email administrador1@seed.test --password 123456
+    """
+    @app.cli.command("load-test")
+    @click.option("--url", required=True)
+    @click.option("--clients", type=click.IntRange(1), default=200)
+    @click.option("--duration", type=float, default=20.0)
+    @click.option("--email")
+    @click.option("--password")
+    def load_test(url, clients, duration, email, password):
+        headers = {}
+        if email:
+            headers["Authorization"] = f"Bearer {login_token(url, email, password)}"
+        stats = run_load_test(url, clients, duration, headers)
+        print(f"{stats['requests']} solicitudes, {stats['errors']} errores con "
+              f"{stats['clients']} clientes: {stats['rps']:.1f} solicitudes/s")
+        print(f"latencia p50 {stats['p50_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, "
+              f"p99 {stats['p99_ms']:.1f} ms, max {stats['max_ms']:.1f} ms")
+
+    """
+    Genera las variantes precomprimidas (.gz y, si esta instalado brotli, .br)
+    de los archivos del frontend para servirlas sin comprimir en cada solicitud.
+    Se ejecuta despues de `npm run build`:
+    $ flask compress-assets
+    """
+    @app.cli.command("compress-assets")
+    @click.option("--directory")
+    @click.option("--min-size", type=int, default=COMPRESS_MIN_SIZE)
+    def compress_assets_command(directory, min_size):
+        written = compress_assets(directory or app.extensions["static_assets"].root, min_size)
+        for filename, original, compressed in written:
+            print(f"{filename}: {original} -> {compressed} bytes")
+        print(f"{len(written)} variantes comprimidas escritas")
+
+    """
+    Compara el tiempo de codificar N expedientes completos (expediente mas sus
+    antecedentes, con fechas y enums) con el proveedor JSON de la app y con el
+    de la biblioteca estandar, incluida la conversion manual que se hacia antes:
+    $ flask bench-json --files 10000
+    """
+    @app.cli.command("bench-json")
+    @click.option("--files", type=click.IntRange(1), default=10000)
+    @click.option("--repeat", type=click.IntRange(1), default=5)
+    def bench_json(files, repeat):
+        import random
+        from datetime import datetime, timezone
+        from api.seed import _file_rows, _user_row
+
+        rng = random.Random(42)
+        now = datetime.now(timezone.utc)
+        records = []
+        for number in range(files):
+            patient = dict(_user_row(rng, UserRole.paciente, number, "x"), id=number)
+            file_row, section_rows = _file_rows(rng, patient, 1, 2, now)
+            record = dict(file_row, id=number)
+            for model, row in section_rows.items():
+                record[model.__tablename__] = row
+            records.append(record)
+
+        def manual(value):
+            # Conversion a mano que hacian los serializadores antes del proveedor
+            if isinstance(value, dict):
+                return {key: manual(item) for key, item in value.items()}
+            if hasattr(value, "isoformat"):
+                return value.isoformat()
+            return getattr(value, "value", value)
+
+        stdlib = StdlibJSONProvider(app)
+        cases = [("biblioteca estandar + conversion manual",
+                  lambda: stdlib.dumps([manual(record) for record in records])),
+                 ("biblioteca estandar (proveedor)", lambda: stdlib.dumps(records))]
+        if JSONProvider is not StdlibJSONProvider:
+            provider = JSONProvider(app)
+            cases.append((f"{JSONProvider.__name__} (proveedor de la app)",
+                          lambda: provider.dumps_bytes(records)))
+        for name, encode in cases:
+            size = len(encode())
+            start = time.perf_counter()
+            for _ in range(repeat):
+                encode()
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"{name}: {elapsed:.1f} ms para {files} expedientes ({size / 1e6:.1f} MB)")
+
+    """
+    Recalcula el documento de busqueda de todos los expedientes, por lotes.
+    Solo hace falta si se cargaron antecedentes por fuera de la app (SQL a mano):
+    $ flask rebuild-search-index --batch-size 1000
+    """
+    @app.cli.command("rebuild-search-index")
+    @click.option("--batch-size", type=click.IntRange(1), default=1000)
+    def rebuild_search_index(batch_size):
+        start = time.perf_counter()
+        count = rebuild_documents(db.session, batch_size)
+        print(f"{count} expedientes indexados en {time.perf_counter() - start:.1f} s")
+
+    """
+    Recalcula desde cero las estadisticas de cohorte de antecedentes familiares
+    (perfiles por expediente y conteos por sexo, edad, estado y factores):
+    $ flask rebuild-family-stats
+    """
+    @app.cli.command("rebuild-family-stats")
+    @click.option("--batch-size", type=click.IntRange(1), default=5000)
+    def rebuild_family_stats_command(batch_size):
+        start = time.perf_counter()
+        files, cells = rebuild_family_stats(db.session, batch_size)
+        print(f"{files} expedientes en {cells} celdas en {time.perf_counter() - start:.1f} s")
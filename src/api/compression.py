@@ -0,0 +1,77 @@
+"""
+Compresion negociada y GET condicional para las respuestas del blueprint `api`.
+- Las respuestas GET exitosas sin ETag reciben uno debil calculado con un hash
+  rapido del cuerpo; si coincide con If-None-Match se responde 304 sin cuerpo.
+- Los cuerpos JSON/texto mayores a COMPRESS_MIN_SIZE se comprimen con brotli
+  (si esta instalado) o gzip segun Accept-Encoding.
+Las respuestas en streaming (exportaciones) se dejan intactas.
+"""
+import gzip
+import hashlib
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+# Calidad de brotli: 4-5 comprime mejor que gzip 6 a una velocidad parecida
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/x-ndjson", "text/plain", "text/html")
+
+
+def _encode(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+
+def _negotiate():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _skip(response):
+    return (response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers)
+
+
+def setup_compression(app):
+    @app.after_request
+    def compress_api_response(response):
+        if request.blueprint != "api" or _skip(response):
+            return response
+
+        data = response.get_data()
+        if request.method in ("GET", "HEAD") and response.status_code == 200:
+            if "ETag" not in response.headers:
+                response.set_etag(hashlib.blake2b(data, digest_size=16).hexdigest(), weak=True)
+                # Datos de usuarios autenticados: solo el navegador guarda copia y la revalida
+                if not response.cache_control:
+                    response.cache_control.private = True
+                    response.cache_control.no_cache = True
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES or len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = _negotiate()
+        if encoding is None:
+            return response
+
+        response.set_data(_encode(data, encoding))
+        response.content_encoding = encoding
+        # El ETag identifica el contenido sin comprimir: con otra codificacion es debil
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,263 @@
+"""
+Configuracion del motor de SQLAlchemy y metricas del pool de conexiones.
+Los parametros del pool se leen de variables de entorno:
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE y DB_POOL_PRE_PING.
+
+Replicas de lectura opcionales (DATABASE_REPLICA_URLS, separadas por comas):
+RoutingSession manda los SELECT de las solicitudes de solo lectura a una replica
+sana elegida por turnos; las escrituras, los SELECT ... FOR UPDATE, cualquier
+lectura posterior a una escritura en la misma sesion y las sesiones marcadas con
+use_primary() van a la principal.
+"""
+import itertools
+import os
+import threading
+import time
+from flask import current_app, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, make_url, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Limites (en segundos) de los buckets del histograma de espera por una conexion
+CHECKOUT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class PoolStats:
+    """Contadores acumulados de un pool: esperas por conexion y timeouts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.buckets = [0] * len(CHECKOUT_BUCKETS)
+
+    def record_checkout(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for index, limit in enumerate(CHECKOUT_BUCKETS):
+                if seconds <= limit:
+                    self.buckets[index] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_buckets": dict(zip(CHECKOUT_BUCKETS, self.buckets)),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuanto espera cada solicitud para obtener una conexion."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # dispose()/recreate() crean un pool nuevo; se conservan los contadores
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+def engine_options(database_url):
+    # SQLite en memoria usa su propio pool de un solo hilo; no se toca
+    if database_url in ("sqlite://", "sqlite:///:memory:"):
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    }
+
+
+def pool_status(engine):
+    # Estado actual del pool mas los contadores acumulados
+    pool = engine.pool
+    status = {"url": engine.url.render_as_string(hide_password=True),
+              "class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
+
+
+# -------------------- REPLICAS DE LECTURA --------------------
+# Segundos entre comprobaciones de cada replica y retraso maximo de replicacion
+REPLICA_CHECK_INTERVAL = float(os.getenv("DATABASE_REPLICA_CHECK_INTERVAL", "10"))
+REPLICA_MAX_LAG = float(os.getenv("DATABASE_REPLICA_MAX_LAG", "30"))
+# Segundos (enteros, minimo 2 en libpq) para abrir una conexion a una replica; acota
+# cuanto puede bloquear a una solicitud una replica que no responde
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("DATABASE_REPLICA_CONNECT_TIMEOUT", "3"))
+
+
+class Replica:
+    """Motor de una replica con su estado de salud."""
+
+    def __init__(self, url):
+        options = engine_options(url)
+        if make_url(url).get_backend_name() == "postgresql":
+            options["connect_args"] = {"connect_timeout": REPLICA_CONNECT_TIMEOUT}
+        self.engine = create_engine(url, **options)
+        self.healthy = True
+        self.error = None
+        self.lag = None
+        self.checked_at = 0.0
+        self._lock = threading.Lock()
+        # Una desconexion a mitad de consulta la saca de turno hasta la siguiente comprobacion
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect or context.connection is None:
+            self.healthy = False
+            self.error = str(context.original_exception)
+
+    def check(self):
+        # SELECT 1 y, en PostgreSQL, el retraso de replicacion. Si la replica ya
+        # aplico todo lo recibido el retraso es 0: sin escrituras en la principal
+        # now() - pg_last_xact_replay_timestamp() crece aunque no falte nada
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                self.lag = None
+                if self.engine.dialect.name == "postgresql":
+                    self.lag = connection.execute(text(
+                        "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+                        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+                        "END")).scalar()
+            if self.lag is not None and REPLICA_MAX_LAG and self.lag > REPLICA_MAX_LAG:
+                self.healthy, self.error = False, f"Retraso de replicacion de {self.lag:.0f} s"
+            else:
+                self.healthy, self.error = True, None
+        except Exception as error:
+            self.healthy, self.error = False, str(error)
+
+    def available(self):
+        # Solo un hilo comprueba; los demas usan el ultimo estado conocido
+        if time.monotonic() - self.checked_at >= REPLICA_CHECK_INTERVAL and self._lock.acquire(blocking=False):
+            try:
+                self.checked_at = time.monotonic()
+                self.check()
+            finally:
+                self._lock.release()
+        return self.healthy
+
+    def status(self):
+        return {"url": self.engine.url.render_as_string(hide_password=True),
+                "healthy": self.healthy, "lag_seconds": self.lag, "error": self.error}
+
+
+class ReplicaRouter:
+    def __init__(self, urls):
+        self.replicas = [Replica(url) for url in urls]
+        self._turn = itertools.count()
+
+    def choose(self):
+        # Por turnos entre las replicas sanas; None si no queda ninguna
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.available():
+                return replica.engine
+        return None
+
+    @property
+    def engines(self):
+        return [replica.engine for replica in self.replicas]
+
+
+def replica_router():
+    return current_app.extensions.get("db_replicas") if has_app_context() else None
+
+
+def read_only_request():
+    # GET/HEAD de la API y las listas de Flask-Admin (endpoints "<vista>.index_view")
+    if not has_request_context() or request.method not in ("GET", "HEAD"):
+        return False
+    return request.blueprint == "api" or (request.endpoint or "").endswith(".index_view")
+
+
+class RoutingSession(Session):
+    """Sesion de Flask-SQLAlchemy que manda las lecturas a una replica cuando se puede."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._replica_allowed(clause):
+            if "replica" not in self.info:
+                # Una sola replica por sesion para no mezclar datos con distinto retraso
+                self.info["replica"] = replica_router().choose()
+            if self.info["replica"] is not None:
+                return self.info["replica"]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_allowed(self, clause):
+        if clause is None or not getattr(clause, "is_select", False):
+            return False
+        if (self._flushing or self.info.get("wrote") or self.info.get("primary")
+                or clause._for_update_arg is not None):
+            return False
+        return replica_router() is not None and read_only_request()
+
+
+def use_primary(session):
+    # Las lecturas que quedan de la sesion van a la principal (p. ej. lo que se va a cachear)
+    session.info["primary"] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+def setup_replicas(app):
+    urls = [url.strip().replace("postgres://", "postgresql://")
+            for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    if urls:
+        app.extensions["db_replicas"] = ReplicaRouter(urls)
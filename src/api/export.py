@@ -0,0 +1,32 @@
+"""
+Exportacion en streaming (NDJSON) de expedientes medicos con sus antecedentes.
+Usa cursores del lado del servidor (yield_per) para que la memoria se mantenga
+constante sin importar cuantos expedientes haya.
+"""
+from sqlalchemy import select
+from api.models import MedicalFile
+from api.serializers import serialize, MEDICAL_FILE_SECTIONS
+from api.json_provider import dumps_bytes
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def iter_medical_file_records(session, batch_size=EXPORT_BATCH_SIZE):
+    # Un solo SELECT con LEFT JOIN a cada antecedente, leido por lotes
+    models = [model for _, model in MEDICAL_FILE_SECTIONS]
+    stmt = select(MedicalFile, *models)
+    for model in models:
+        stmt = stmt.outerjoin(model, model.medical_file_id == MedicalFile.id)
+    stmt = stmt.order_by(MedicalFile.id).execution_options(yield_per=batch_size)
+
+    for row in session.execute(stmt):
+        record = serialize(row[0])
+        for (key, _), section in zip(MEDICAL_FILE_SECTIONS, row[1:]):
+            record[key] = serialize(section)
+        yield record
+
+
+def iter_ndjson(records):
+    # Lineas en bytes UTF-8: se escriben tal cual en la respuesta o en un archivo
+    for record in records:
+        yield dumps_bytes(record) + b"\n"
@@ -0,0 +1,114 @@
+"""
+Carga masiva de expedientes medicos.
+Convierte cada payload (mismo formato que POST /api/medical-file) en filas y
+las inserta por lotes con INSERT ... RETURNING y executemany, un commit por lote.
+"""
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
+from api.models import MedicalFile, FileStatus
+from api.schemas import SECTION_MODELS, MEDICAL_FILE_SCHEMA
+from api.search import refresh_documents
+from api.stats import refresh_profiles
+
+BULK_CHUNK_SIZE = 500
+
+
+def _item_error(index, error):
+    # El mensaje del driver puede incluir valores de la fila (datos del paciente):
+    # se registra en el servidor y al cliente se le da uno generico
+    current_app.logger.warning("Carga masiva: elemento %s rechazado: %s", index, error)
+    if isinstance(error, IntegrityError):
+        return "El expediente entra en conflicto con datos existentes"
+    if isinstance(error, DataError):
+        return "Algún valor no es válido para la base de datos"
+    return "No se pudo guardar el expediente"
+
+
+def medical_file_rows(data, now=None):
+    """
+    Devuelve (fila de MedicalFile, {modelo: fila}) para un payload ya validado
+    con MEDICAL_FILE_SCHEMA; la seccion ginecologica solo esta si aplica.
+    """
+    now = now or datetime.now(timezone.utc)
+    file_row = {
+        "user_id": data["user_id"],
+        "supervised_by": data["supervised_by"],
+        "supervised_at": now,
+        "created_by": data["created_by"],
+        "created_at": now,
+        "confirmed_at": now,
+        "status": FileStatus.revision,
+    }
+    section_rows = {}
+    for key, model in SECTION_MODELS.items():
+        if key in data:
+            section_rows[model] = dict(data[key], user_id=data["user_id"])
+    return file_row, section_rows
+
+
+def insert_file_rows(session, items):
+    # items: lista de (fila de MedicalFile, {modelo: fila}); devuelve los ids en orden
+    stmt = insert(MedicalFile).returning(
+        MedicalFile.id, sort_by_parameter_order=True)
+    file_ids = session.scalars(stmt, [file_row for file_row, _ in items]).all()
+
+    rows_by_model = {}
+    for file_id, (_, section_rows) in zip(file_ids, items):
+        for model, row in section_rows.items():
+            rows_by_model.setdefault(model, []).append(
+                dict(row, medical_file_id=file_id))
+    for model, rows in rows_by_model.items():
+        session.execute(insert(model), rows)
+    # Los INSERT de Core no pasan por los eventos del ORM: documento de busqueda
+    # y estadisticas de cohorte a mano
+    refresh_documents(session, file_ids)
+    refresh_profiles(session, file_ids)
+    return file_ids
+
+
+def insert_medical_files(session, payloads, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Valida cada payload con MEDICAL_FILE_SCHEMA e inserta los validos por lotes
+    de `chunk_size`, con una transaccion por lote.
+    Si un lote falla en la base de datos se reintenta elemento por elemento con
+    SAVEPOINTs para saber exactamente cuales fallaron.
+    Devuelve un resultado por payload, en el mismo orden.
+    """
+    results = [None] * len(payloads)
+    now = datetime.now(timezone.utc)
+
+    for start in range(0, len(payloads), chunk_size):
+        chunk = []
+        for index in range(start, min(start + chunk_size, len(payloads))):
+            # Mismas reglas que POST /api/medical-file; los errores quedan en su elemento
+            data, errors = MEDICAL_FILE_SCHEMA.validate(payloads[index])
+            if errors:
+                results[index] = {"index": index, "error": "Datos inválidos", "errors": errors}
+            else:
+                chunk.append((index, medical_file_rows(data, now)))
+
+        if not chunk:
+            continue
+
+        try:
+            file_ids = insert_file_rows(session, [rows for _, rows in chunk])
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            file_ids = []
+            for index, rows in chunk:
+                try:
+                    with session.begin_nested():
+                        file_ids.append(insert_file_rows(session, [rows])[0])
+                except SQLAlchemyError as error:
+                    file_ids.append(None)
+                    results[index] = {"index": index, "error": _item_error(index, error)}
+            session.commit()
+
+        for (index, _), file_id in zip(chunk, file_ids):
+            if file_id is not None:
+                results[index] = {"index": index, "medical_file_id": file_id}
+
+    return results
@@ -0,0 +1,200 @@
+"""
+Cola de trabajos en segundo plano respaldada por la tabla `jobs`.
+La API encola el trabajo y responde 202 de inmediato; `flask worker` toma los
+pendientes y los ejecuta en un pool de hilos, cada uno con su propio contexto
+de aplicacion (y por lo tanto su propia sesion). En PostgreSQL los workers se
+reparten los trabajos con SELECT ... FOR UPDATE SKIP LOCKED, asi que pueden
+correr varios procesos o maquinas a la vez sin bloquearse entre si.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta, timezone
+from flask import request
+from sqlalchemy import select, update, delete, insert
+from api.models import db, Job, JobStatus, JobFileChunk, User
+from api.ingest import insert_medical_files, BULK_CHUNK_SIZE
+from api.export import iter_medical_file_records, iter_ndjson
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+# Un trabajo en proceso por mas tiempo se considera abandonado (worker caido)
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "3600"))
+# Tamaño de cada trozo con el que se guardan en la base los archivos de los trabajos
+JOB_FILE_CHUNK_SIZE = int(os.getenv("JOB_FILE_CHUNK_SIZE", str(1024 * 1024)))
+
+HANDLERS = {}
+
+
+def job_handler(kind):
+    # Registra la funcion que ejecuta los trabajos de tipo `kind`: handler(job) -> resultado
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def async_requested():
+    # ?async=true en los endpoints que pueden delegar el trabajo a la cola
+    return request.args.get("async", "").lower() in ("1", "true", "yes")
+
+
+def enqueue(session, kind, payload, created_by=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+    job = Job(kind=kind, payload=payload, created_by=created_by,
+              status=JobStatus.pendiente, attempts=0)
+    session.add(job)
+    session.commit()
+    return job
+
+
+def claim_next(session):
+    """Marca como en proceso el pendiente mas antiguo y devuelve su id (o None)."""
+    job_id = session.scalar(
+        select(Job.id)
+        .where(Job.status == JobStatus.pendiente)
+        .order_by(Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True))
+    if job_id is None:
+        session.rollback()
+        return None
+    # El UPDATE condicionado evita que dos workers tomen el mismo trabajo en
+    # motores sin SKIP LOCKED (SQLite)
+    claimed = session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.pendiente)
+        .values(status=JobStatus.en_proceso, started_at=datetime.now(timezone.utc),
+                attempts=Job.attempts + 1)
+        .execution_options(synchronize_session=False)).rowcount
+    session.commit()
+    return job_id if claimed else None
+
+
+def requeue_stale(session, stale_after=JOB_STALE_AFTER):
+    # Devuelve a la cola los trabajos que un worker dejo a medias
+    limit = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+    count = session.execute(
+        update(Job)
+        .where(Job.status == JobStatus.en_proceso, Job.started_at < limit)
+        .values(status=JobStatus.pendiente)
+        .execution_options(synchronize_session=False)).rowcount
+    session.commit()
+    return count
+
+
+def run_job(app, job_id, echo=print):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        try:
+            result = HANDLERS[job.kind](job)
+        except Exception as error:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.status = JobStatus.fallido
+            job.error = f"{type(error).__name__}: {error}"
+            app.logger.exception("Trabajo %s (%s) fallido", job_id, job.kind)
+        else:
+            job.status = JobStatus.completado
+            job.result = result
+        job.finished_at = datetime.now(timezone.utc)
+        db.session.commit()
+        echo(f"Trabajo {job_id} ({job.kind}): {job.status.value}")
+
+
+def run_worker(app, concurrency=JOB_CONCURRENCY, poll_interval=JOB_POLL_INTERVAL,
+               once=False, echo=print):
+    """
+    Ejecuta trabajos hasta que se interrumpa el proceso. Con once=True termina
+    cuando la cola queda vacia y no hay trabajos en curso.
+    """
+    with app.app_context():
+        requeued = requeue_stale(db.session)
+    if requeued:
+        echo(f"{requeued} trabajos abandonados devueltos a la cola")
+
+    running = set()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job") as pool:
+        while True:
+            running = {future for future in running if not future.done()}
+            if len(running) >= concurrency:
+                wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                continue
+            with app.app_context():
+                job_id = claim_next(db.session)
+            if job_id is not None:
+                running.add(pool.submit(run_job, app, job_id, echo))
+                continue
+            if once:
+                if not running:
+                    return
+                wait(running, return_when=FIRST_COMPLETED)
+                continue
+            time.sleep(poll_interval)
+
+
+# -------------------- ARCHIVOS --------------------
+# Los archivos se guardan en job_file_chunks (no en el disco del worker): la API y
+# el worker pueden correr en maquinas distintas y ambos ven la misma base
+def write_job_file(session, job_id, parts, chunk_size=JOB_FILE_CHUNK_SIZE):
+    """
+    Guarda `parts` (bytes) en trozos de ~chunk_size, reemplazando el archivo de
+    un intento anterior. Devuelve cuantas partes se escribieron.
+    """
+    session.execute(delete(JobFileChunk).where(JobFileChunk.job_id == job_id))
+    count, seq, buffer = 0, 0, bytearray()
+    for part in parts:
+        count += 1
+        buffer += part
+        if len(buffer) >= chunk_size:
+            session.execute(insert(JobFileChunk), [{"job_id": job_id, "seq": seq, "data": bytes(buffer)}])
+            seq, buffer = seq + 1, bytearray()
+    if buffer or seq == 0:
+        session.execute(insert(JobFileChunk), [{"job_id": job_id, "seq": seq, "data": bytes(buffer)}])
+    return count
+
+
+def has_job_file(session, job_id):
+    return session.scalar(select(JobFileChunk.seq).where(JobFileChunk.job_id == job_id).limit(1)) is not None
+
+
+def iter_job_file(session, job_id):
+    # Un trozo por consulta: la memoria no depende del tamaño del archivo
+    seq = -1
+    while True:
+        chunk = session.execute(
+            select(JobFileChunk.seq, JobFileChunk.data)
+            .where(JobFileChunk.job_id == job_id, JobFileChunk.seq > seq)
+            .order_by(JobFileChunk.seq).limit(1)).first()
+        if chunk is None:
+            return
+        seq = chunk.seq
+        yield chunk.data
+
+
+# -------------------- TRABAJOS --------------------
+@job_handler("delete_user")
+def delete_user_job(job):
+    # El borrado arrastra en cascada el expediente y los expedientes creados o supervisados
+    user = db.session.get(User, job.payload["user_id"])
+    if user is None:
+        return {"deleted": False}
+    db.session.delete(user)
+    db.session.commit()
+    return {"deleted": True}
+
+
+@job_handler("import_medical_files")
+def import_medical_files_job(job):
+    results = insert_medical_files(
+        db.session, job.payload["payloads"], job.payload.get("chunk_size", BULK_CHUNK_SIZE))
+    created = sum(1 for result in results if "medical_file_id" in result)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+@job_handler("export_medical_files")
+def export_medical_files_job(job):
+    # El archivo se confirma en el mismo commit que marca el trabajo como completado
+    count = write_job_file(db.session, job.id, iter_ndjson(iter_medical_file_records(db.session)))
+    return {"records": count}
@@ -0,0 +1,84 @@
+"""
+Proveedor JSON de la app basado en orjson, con la biblioteca estandar como respaldo.
+Serializa de forma nativa datetime, date y los enums de models.py (UserRole,
+FileStatus, UserStatus, SexType), asi los serializadores pueden devolver los
+valores tal cual sin llamar a .isoformat() ni .value a mano.
+Como el proveedor por defecto de Flask, Decimal y UUID se codifican como texto
+y las dataclasses como objetos.
+Sin orjson instalado se usa json de la biblioteca estandar con las mismas
+conversiones (fechas en ISO 8601 y enums por su valor).
+"""
+import dataclasses
+import decimal
+import enum
+import json
+import uuid
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    # Solo se llama con tipos que el codificador no conoce
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """El proveedor de Flask pero con fechas ISO 8601 en lugar de fechas HTTP."""
+    default = staticmethod(_default)
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode()
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    # orjson siempre produce UTF-8 y no indenta mas que a 2 espacios
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Opciones propias de json.dumps (indent, separators...): biblioteca estandar
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def dumps_bytes(self, obj):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+
+JSONProvider = OrjsonProvider if orjson is not None else StdlibJSONProvider
+
+
+def dumps_bytes(obj, sort_keys=False):
+    """Codifica fuera de una respuesta (exportaciones, benchmarks)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, default=_default, ensure_ascii=False, sort_keys=sort_keys).encode()
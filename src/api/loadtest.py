@@ -0,0 +1,91 @@
+"""
+Prueba de carga minima con la biblioteca estandar.
+Cada cliente es un hilo con su propia conexion HTTP keep-alive que repite la
+misma solicitud durante `duration` segundos; al final se reportan solicitudes
+por segundo, errores y percentiles de latencia. Sirve para comparar los modos
+de gunicorn (sync, gthread, gevent) con el mismo numero de clientes.
+"""
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _connection(parts, timeout):
+    connection_class = (http.client.HTTPSConnection if parts.scheme == "https"
+                        else http.client.HTTPConnection)
+    return connection_class(parts.netloc, timeout=timeout)
+
+
+def login_token(url, email, password, timeout=30):
+    # Obtiene un JWT con POST /api/login en el mismo servidor que `url`
+    parts = urlsplit(url)
+    connection = _connection(parts, timeout)
+    connection.request("POST", "/api/login", body=json.dumps({"email": email, "password": password}),
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    data = json.loads(response.read() or b"{}")
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"Login fallido ({response.status}): {data.get('message')}")
+    return data["token"]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_load_test(url, clients=200, duration=20.0, headers=None, timeout=30):
+    """Devuelve un diccionario con rps, errores y latencias (en ms) p50/p95/p99/max."""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    headers = dict(headers or {})
+    start_barrier = threading.Barrier(clients + 1)
+    results = [None] * clients
+
+    def client(number):
+        latencies, errors = [], 0
+        connection = _connection(parts, timeout)
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                connection = _connection(parts, timeout)
+                continue
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+        results[number] = (latencies, errors)
+
+    threads = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(value for values, _ in results for value in values)
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
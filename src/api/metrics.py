@@ -0,0 +1,214 @@
+"""
+Instrumentacion de las solicitudes al blueprint `api`.
+Por ruta y metodo se registran: tiempo total, numero de sentencias SQL, tiempo
+en base de datos y tamaño de la respuesta, en histogramas en memoria del
+proceso que se exponen en formato de texto de Prometheus (GET /api/metrics).
+Con SLOW_REQUEST_MS > 0 las solicitudes lentas se registran en el log junto a
+las sentencias SQL que ejecutaron.
+"""
+import os
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from api.database import CHECKOUT_BUCKETS, pool_status
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+# Sentencias guardadas como maximo por solicitud para el log de solicitudes lentas
+SLOW_REQUEST_MAX_STATEMENTS = 50
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Histograma acumulativo al estilo de Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, limit in enumerate(self.buckets):
+            if value <= limit:
+                self.counts[index] += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.requests = {}
+        # Otros contadores: (nombre, etiquetas) -> valor
+        self.counters = {}
+
+    def observe(self, name, buckets, labels, value):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def count_request(self, labels):
+        with self._lock:
+            self.requests[labels] = self.requests.get(labels, 0) + 1
+
+    def count(self, name, labels, value=1):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def render(self):
+        lines = ["# TYPE http_requests_total counter"]
+        with self._lock:
+            for labels, value in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{_labels(labels)} {value}")
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(labels)} {value}")
+            names = sorted({name for name, _ in self.histograms})
+            for name in names:
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self.histograms.items()):
+                    if metric == name:
+                        lines.extend(_histogram_lines(name, labels, histogram))
+        return lines
+
+
+registry = MetricsRegistry()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    for limit, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f"{name}_bucket{_labels(labels, le=limit)} {count}")
+    lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} {histogram.count}')
+    lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+def _pool_lines(engines):
+    gauges = {
+        "db_pool_size": "size",
+        "db_pool_checked_out": "checked_out",
+        "db_pool_checked_in": "checked_in",
+        "db_pool_overflow": "overflow",
+    }
+    lines = []
+    statuses = [pool_status(engine) for engine in engines]
+    for metric, key in gauges.items():
+        lines.append(f"# TYPE {metric} gauge")
+        for status in statuses:
+            if key in status:
+                lines.append(f"{metric}{_labels([('url', status['url'])])} {status[key]}")
+
+    lines.append("# TYPE db_pool_checkout_timeouts_total counter")
+    for status in statuses:
+        if "timeouts" in status:
+            lines.append(
+                f"db_pool_checkout_timeouts_total{_labels([('url', status['url'])])} {status['timeouts']}")
+
+    lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+    for status in statuses:
+        if "checkouts" not in status:
+            continue
+        histogram = Histogram(CHECKOUT_BUCKETS)
+        histogram.counts = [status["wait_seconds_buckets"][limit] for limit in CHECKOUT_BUCKETS]
+        histogram.count = status["checkouts"]
+        histogram.sum = status["wait_seconds_total"]
+        lines.extend(_histogram_lines(
+            "db_pool_checkout_wait_seconds", (("url", status["url"]),), histogram))
+    return lines
+
+
+def render_prometheus(engines):
+    return "\n".join(registry.render() + _pool_lines(engines)) + "\n"
+
+
+# -------------------- CONTADORES DE SQL POR SOLICITUD --------------------
+# El inicio se guarda en el contexto de ejecucion (uno por sentencia): una
+# sentencia que falla no deja nada en la conexion y se cuenta en handle_error
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(context, statement)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    _record_statement(exception_context.execution_context, exception_context.statement)
+
+
+def _record_statement(context, statement):
+    start = getattr(context, "_metrics_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    context._metrics_start = None
+    if not has_request_context() or "metrics_start" not in g:
+        return
+    g.sql_queries += 1
+    g.sql_seconds += elapsed
+    if SLOW_REQUEST_MS > 0 and len(g.sql_statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        g.sql_statements.append((elapsed, statement))
+
+
+def setup_metrics(app):
+    @app.before_request
+    def start_request_metrics():
+        if request.blueprint != "api":
+            return
+        g.metrics_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+        g.sql_statements = []
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "metrics_start" not in g:
+            return response
+        elapsed = time.perf_counter() - g.metrics_start
+        route = request.url_rule.rule if request.url_rule else "desconocida"
+        labels = (("route", route), ("method", request.method))
+
+        registry.count_request(labels + (("status", response.status_code),))
+        registry.observe("http_request_duration_seconds", DURATION_BUCKETS, labels, elapsed)
+        registry.observe("http_request_sql_queries", QUERY_COUNT_BUCKETS, labels, g.sql_queries)
+        registry.observe("http_request_db_duration_seconds", DURATION_BUCKETS, labels, g.sql_seconds)
+        # Las respuestas en streaming no tienen tamaño conocido
+        if not response.is_streamed:
+            registry.observe("http_response_size_bytes", SIZE_BUCKETS, labels,
+                             response.calculate_content_length() or 0)
+
+        if SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS:
+            statements = "\n".join(f"  [{seconds * 1000:.1f} ms] {statement}"
+                                   for seconds, statement in g.sql_statements)
+            app.logger.warning(
+                "Solicitud lenta %s %s: %.1f ms, %d sentencias SQL (%.1f ms en BD)\n%s",
+                request.method, route, elapsed * 1000, g.sql_queries,
+                g.sql_seconds * 1000, statements)
+        return response
@@ -6,7 +6,7 @@
 # Importa la extensión de SQLAlchemy para usarla con Flask
 from flask_sqlalchemy import SQLAlchemy
 # Importa tipos y funciones necesarios para definir columnas y relaciones en la base de datos
-from sqlalchemy import String, Integer, Boolean, Date, DateTime, Column, ForeignKey, Enum, Text, func
+from sqlalchemy import String, Integer, Boolean, Date, DateTime, Column, ForeignKey, Enum, Text, Index, JSON, LargeBinary, func, text
 # Importa utilidades para mapear columnas y relaciones en los modelos
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 # Importa clase para trabajar con fechas y horas
@@ -14,8 +14,10 @@ from datetime import datetime
 from datetime import date
 # Importa módulo para crear enumeraciones (valores limitados)
 import enum
+# Importa la sesión que reparte las lecturas entre la base principal y las réplicas
+from api.database import RoutingSession
 # Crea una instancia de SQLAlchemy para usarla en la app Flask
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 # # -------------------- ENUMS PERSONALIZADOS --------------------
@@ -48,6 +50,13 @@ class SexType(str, enum.Enum):
     otro = "otro"
 
 
+class JobStatus(str, enum.Enum):
+    pendiente = "pendiente"  # En cola, esperando a un worker
+    en_proceso = "en_proceso"  # Tomado por un worker
+    completado = "completado"
+    fallido = "fallido"
+
+
 # -------------------- MODELO: User --------------------
 # Definicion y Descripcion
 # RESUMEN: Modelo que representa a los usuarios del sistema. Puede contener la info de Id email y Rol
@@ -55,6 +64,11 @@ class SexType(str, enum.Enum):
 
 class User(db.Model):
     __tablename__ = "users"
+    # Filtros del listado de usuarios: ?role= y ?status=
+    __table_args__ = (
+        Index("ix_users_role_status", "role", "status"),
+        Index("ix_users_status", "status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     names: Mapped[str] = mapped_column(String(100), nullable=False)
@@ -85,12 +99,12 @@ class User(db.Model):
         return {
             "id": self.id,
             "email": self.email,
-            "role": self.role.value,
-            "status": self.status.value,
+            "role": self.role,
+            "status": self.status,
             "names": self.names,
             "first_surname": self.first_surname,
             "second_surname": self.second_surname,
-            "birth_day": self.birth_day.isoformat(),
+            "birth_day": self.birth_day,
             "profession": self.profession,
         }
 
@@ -103,16 +117,24 @@ class User(db.Model):
 # Definición de la clase MedicalFile que hereda de db.Model (SQLAlchemy)
 class MedicalFile(db.Model):
     __tablename__ = "medical_files"  # Nombre que tendrá la tabla en la base de datos
+    # Índices para los filtros de GET /api/medical_files (creador/supervisor + estado)
+    __table_args__ = (
+        Index("ix_medical_files_created_by_status", "created_by", "status"),
+        Index("ix_medical_files_supervised_by_status",
+              "supervised_by", "status"),
+    )
 
     # Clave primaria del expediente ( del user), tipo entero
     id: Mapped[int] = mapped_column(primary_key=True)
     # ID del paciente relacionado (puede ser nulo)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=True)
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), nullable=True, index=True)
     # ID del profesional que crea el expediente (obligatorio)
     created_by: Mapped[int] = mapped_column(
         ForeignKey("users.id"), nullable=False)
     # Fecha y hora de creación automática del expediente
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=func.now())
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), index=True)
     supervised_by: Mapped[int] = mapped_column(
         ForeignKey("users.id"), nullable=False)
     # Fecha y hora de creación automática del expediente
@@ -121,6 +143,11 @@ class MedicalFile(db.Model):
     status: Mapped["FileStatus"] = mapped_column(
         Enum(FileStatus), nullable=False, default=FileStatus.revision.value)
 
+    # Versión de la fila: cada UPDATE la incrementa y falla si otro la cambió antes
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     # Relación con el modelo User para acceder al paciente
     user: Mapped["User"] = relationship("User", foreign_keys=[user_id])
     creator: Mapped["User"] = relationship("User", foreign_keys=[created_by])
@@ -146,10 +173,10 @@ class MedicalFile(db.Model):
             "id": self.id,  # El ID del expediente
             "user_id": self.user_id,  # El ID del paciente
             "created_by": self.created_by,  # El ID del profesional que lo creó
-            "created_at": self.created_at.isoformat(),
+            "created_at": self.created_at,
             "supervised_by": self.supervised_by,
             # La fecha en formato legible ISO 8601
-            "supervised_at": self.supervised_at.isoformat()
+            "supervised_at": self.supervised_at
         }
         # Método para representar el expediente como una cadena
         # Retorna una cadena con el ID del expediente y el ID del paciente asociado
@@ -164,7 +191,7 @@ class PersonalData(db.Model):
     user_id: Mapped[int] = mapped_column(ForeignKey(
         "users.id"), nullable=False, unique=True)  # Relación 1:1 con usuario
     medical_file_id: Mapped[int] = mapped_column(ForeignKey(
-        "medical_files.id"), nullable=True)  # Expediente asociado
+        "medical_files.id"), nullable=True, index=True)  # Expediente asociado
 
     full_name: Mapped[str] = mapped_column(
         String(50), nullable=False)  # Nombre completo
@@ -178,6 +205,11 @@ class PersonalData(db.Model):
     address: Mapped[str] = mapped_column(Text)  # Dirección
     phone: Mapped[str] = mapped_column(String(30))  # Teléfono
 
+    # Versión de la fila: cada UPDATE la incrementa y falla si otro la cambió antes
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     medical_file: Mapped["MedicalFile"] = relationship(
         "MedicalFile", back_populates="personal_data")
 
@@ -190,7 +222,7 @@ class PathologicalBackground(db.Model):
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id"), nullable=False, unique=True)
     medical_file_id: Mapped[int] = mapped_column(ForeignKey(
-        "medical_files.id"), nullable=False)  # Relación con expediente
+        "medical_files.id"), nullable=False, index=True)  # Relación con expediente
 
     # Futuro uso de la api irian la lista de codigos de enfermededes                                                                        ## Enfermedades personales
     personal_diseases: Mapped[str] = mapped_column(db.Text, nullable=True)
@@ -202,6 +234,11 @@ class PathologicalBackground(db.Model):
     allergies: Mapped[str] = mapped_column(Text)  # Alergias
     others: Mapped[str] = mapped_column(Text)  # Otros antecedentes
 
+    # Versión de la fila: cada UPDATE la incrementa y falla si otro la cambió antes
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     medical_file: Mapped["MedicalFile"] = relationship(
         "MedicalFile", back_populates="pathological_background")
 
@@ -214,7 +251,7 @@ class FamilyBackground(db.Model):
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id"), nullable=False, unique=True)
     medical_file_id: Mapped[int] = mapped_column(ForeignKey(
-        "medical_files.id"), nullable=False)  # Relación con expediente
+        "medical_files.id"), nullable=False, index=True)  # Relación con expediente
 
     hypertension: Mapped[bool] = mapped_column(
         Boolean, default=False)  # Hipertensión hereditaria
@@ -234,6 +271,11 @@ class FamilyBackground(db.Model):
         Boolean, default=False)  # Malformaciones congénitas
     others: Mapped[str] = mapped_column(Text)
 
+    # Versión de la fila: cada UPDATE la incrementa y falla si otro la cambió antes
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     medical_file: Mapped["MedicalFile"] = relationship(
         "MedicalFile", back_populates="family_background")
 
@@ -246,7 +288,7 @@ class GynecologicalBackground(db.Model):
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id"), nullable=False, unique=True)
     medical_file_id: Mapped[int] = mapped_column(ForeignKey(
-        "medical_files.id"), nullable=False)  # Relación con expediente
+        "medical_files.id"), nullable=False, index=True)  # Relación con expediente
 
     menarche_age: Mapped[int] = mapped_column(
         Integer)  # Edad de la primera menstruación
@@ -258,6 +300,11 @@ class GynecologicalBackground(db.Model):
         Text)  # Método anticonceptivo usado
     others: Mapped[str] = mapped_column(Text)
 
+    # Versión de la fila: cada UPDATE la incrementa y falla si otro la cambió antes
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     medical_file: Mapped["MedicalFile"] = relationship(
         "MedicalFile", back_populates="gynecological_background")
 
@@ -270,7 +317,7 @@ class NonPathologicalBackground(db.Model):
     user_id: Mapped[int] = mapped_column(
         ForeignKey("users.id"), nullable=False, unique=True)
     medical_file_id: Mapped[int] = mapped_column(ForeignKey(
-        "medical_files.id"), nullable=False)  # Relación con expediente
+        "medical_files.id"), nullable=False, index=True)  # Relación con expediente
 
     education_level: Mapped[str] = mapped_column(String(50))  # Nivel educativo
     economic_activity: Mapped[str] = mapped_column(Text)  # Actividad económica
@@ -296,7 +343,116 @@ class NonPathologicalBackground(db.Model):
     addictions: Mapped[str] = mapped_column(Text)  # Adicciones
     otherS: Mapped[str] = mapped_column(Text)  # Otro tipo de antecedentes
 
+    # Versión de la fila: cada UPDATE la incrementa y falla si otro la cambió antes
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default="1")
+    __mapper_args__ = {"version_id_col": version}
+
     medical_file: Mapped["MedicalFile"] = relationship(
         "MedicalFile", back_populates="non_pathological_background")
 
 
+# -------------------- MODELO: MedicalFileSearch --------------------
+# RESUMEN: Documento de búsqueda de texto completo por expediente: el texto libre
+# de los antecedentes patológicos y no patológicos. Se mantiene al guardar
+# (api/search.py). En PostgreSQL lo indexa un GIN sobre to_tsvector('spanish').
+class MedicalFileSearch(db.Model):
+    __tablename__ = "medical_file_search"
+    __table_args__ = (
+        Index("ix_medical_file_search_document",
+              text("to_tsvector('spanish', document)"),
+              postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+    medical_file_id: Mapped[int] = mapped_column(
+        ForeignKey("medical_files.id", ondelete="CASCADE"), primary_key=True)
+    document: Mapped[str] = mapped_column(Text, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=func.now(), index=True)
+
+
+# -------------------- MODELO: FamilyRiskProfile --------------------
+# RESUMEN: Perfil de cohorte de cada expediente con antecedentes familiares: sexo,
+# grupo de edad al crear el expediente, estado y los ocho factores hereditarios
+# como mapa de bits. Guarda a qué celda de FamilyRiskStat suma cada expediente
+# para poder restarlo al cambiar (api/stats.py). Sin llave foránea: es derivado.
+class FamilyRiskProfile(db.Model):
+    __tablename__ = "family_risk_profiles"
+
+    medical_file_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    sex: Mapped[str] = mapped_column(String(20), nullable=False)
+    age_band: Mapped[str] = mapped_column(String(10), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False)
+    flags: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+# -------------------- MODELO: FamilyRiskStat --------------------
+# RESUMEN: Cantidad de expedientes por sexo, grupo de edad, estado y combinación
+# exacta de factores hereditarios (a lo sumo 256 combinaciones por cohorte).
+class FamilyRiskStat(db.Model):
+    __tablename__ = "family_risk_stats"
+
+    sex: Mapped[str] = mapped_column(String(20), primary_key=True)
+    age_band: Mapped[str] = mapped_column(String(10), primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), primary_key=True)
+    flags: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+# -------------------- MODELO: Job --------------------
+# RESUMEN: Cola de trabajos en segundo plano (borrados en cascada, exportaciones,
+# cargas masivas). Los encola la API y los ejecuta `flask worker`.
+class Job(db.Model):
+    __tablename__ = "jobs"
+    # El worker busca el pendiente mas antiguo: WHERE status = ... ORDER BY id
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)  # Tipo de trabajo
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)  # Argumentos del trabajo
+    status: Mapped[JobStatus] = mapped_column(
+        Enum(JobStatus), nullable=False, default=JobStatus.pendiente)
+    result: Mapped[dict] = mapped_column(JSON, nullable=True)  # Resultado al completarse
+    error: Mapped[str] = mapped_column(Text, nullable=True)  # Error si falló
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Sin ForeignKey: el trabajo puede borrar al propio usuario que lo encoló
+    created_by: Mapped[int] = mapped_column(Integer, nullable=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=func.now())
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+            "created_by": self.created_by,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def __repr__(self):
+        return f"<Job {self.id} - {self.kind} {self.status.value}>"
+
+
+# -------------------- MODELO: JobFileChunk --------------------
+# RESUMEN: Archivo generado por un trabajo (exportaciones NDJSON), guardado en
+# trozos en la base de datos para que la API lo sirva aunque el worker corra en
+# otra maquina. Se lee trozo por trozo, sin cargar el archivo completo en memoria.
+class JobFileChunk(db.Model):
+    __tablename__ = "job_file_chunks"
+
+    job_id: Mapped[int] = mapped_column(
+        ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"<JobFileChunk {self.job_id}#{self.seq}>"
@@ -0,0 +1,129 @@
+"""
+Paginacion por cursor (keyset) para los listados de la API.
+El cursor es opaco para el cliente: codifica en base64 los valores de la
+ultima fila devuelta, asi la pagina N cuesta lo mismo que la pagina 1.
+"""
+import base64
+import enum
+import json
+from datetime import date, datetime
+from flask import request
+from sqlalchemy import and_, or_
+from api.utils import APIException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise APIException("Cursor inválido", status_code=400)
+
+
+def page_size_arg():
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    if limit < 1:
+        raise APIException("El parámetro limit debe ser positivo", status_code=400)
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def date_arg(name):
+    # Acepta fechas (YYYY-MM-DD) o fechas con hora en formato ISO 8601
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise APIException(
+            f"Fecha inválida en el parámetro {name}", status_code=400)
+
+
+def enum_arg(name, enum_class):
+    # Acepta tanto el valor ("administrador") como el nombre ("admin") del enum
+    value = request.args.get(name)
+    if value is None:
+        return None
+    for member in enum_class:
+        if value in (member.value, member.name):
+            return member
+    raise APIException(
+        f"Valor inválido en el parámetro {name}", status_code=400)
+
+
+def keyset_page(stmt, columns, session, limit, cursor=None, descending=False):
+    """
+    Aplica el orden y la condicion keyset sobre `columns` (la ultima debe ser
+    unica, normalmente el id) y devuelve (filas, siguiente_cursor).
+    """
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise APIException("Cursor inválido", status_code=400)
+        values = [_from_cursor_value(column, value)
+                  for column, value in zip(columns, values)]
+        stmt = stmt.where(_after(columns, values, descending))
+
+    order = [column.desc() if descending else column.asc()
+             for column in columns]
+    rows = session.scalars(stmt.order_by(*order).limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            [_to_cursor_value(getattr(last, column.key)) for column in columns])
+    return rows, next_cursor
+
+
+def _after(columns, values, descending):
+    # (a, b) > (x, y)  =>  a > x OR (a = x AND b > y), portable a SQLite
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+def _to_cursor_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _from_cursor_value(column, value):
+    # El cursor viene del cliente: un valor de otro tipo que la columna llegaria
+    # a la base como parametro invalido (DataError en PostgreSQL) en lugar de 400
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if value is None:
+        return value
+    if python_type in (datetime, date):
+        try:
+            return python_type.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise APIException("Cursor inválido", status_code=400)
+    if issubclass(python_type, enum.Enum):
+        # Los enums viajan por su valor (ver _to_cursor_value)
+        for member in python_type:
+            if member.value == value:
+                return member
+        raise APIException("Cursor inválido", status_code=400)
+    if python_type is int and (isinstance(value, bool) or not isinstance(value, int)):
+        raise APIException("Cursor inválido", status_code=400)
+    if python_type is str and not isinstance(value, str):
+        raise APIException("Cursor inválido", status_code=400)
+    return value
@@ -0,0 +1,74 @@
+"""
+Hash de contraseñas configurable.
+- PASSWORD_HASH_METHOD: metodo de werkzeug con sus parametros, por ejemplo
+  "scrypt", "scrypt:32768:8:1" o "pbkdf2:sha256:600000".
+- PASSWORD_HASH_WORKERS: hilos dedicados a verificar contraseñas (0 = en el hilo
+  de la solicitud). scrypt y pbkdf2 liberan el GIL, asi que con workers gthread
+  o gevent el resto de solicitudes sigue atendiendose mientras se verifica.
+- PASSWORD_HASH_QUEUE: verificaciones pendientes permitidas antes de responder 503.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+from api.utils import APIException
+
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+_executor = None
+_slots = None
+if PASSWORD_HASH_WORKERS > 0:
+    _executor = ThreadPoolExecutor(
+        max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    _slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
+
+@lru_cache(maxsize=None)
+def method_prefix(method):
+    # werkzeug guarda el metodo con todos sus parametros ("scrypt:32768:8:1$sal$hash")
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def hash_password(password, method=None):
+    return generate_password_hash(password, method=method or PASSWORD_HASH_METHOD)
+
+
+def needs_rehash(pwhash):
+    # True si el hash se generó con un metodo o parametros distintos a los configurados
+    return pwhash.split("$", 1)[0] != method_prefix(PASSWORD_HASH_METHOD)
+
+
+def verify_password(pwhash, password):
+    if _executor is None:
+        return check_password_hash(pwhash, password)
+
+    if not _slots.acquire(blocking=False):
+        raise APIException(
+            "Servidor ocupado, intenta de nuevo en unos segundos", status_code=503)
+    try:
+        future = _executor.submit(check_password_hash, pwhash, password)
+    except RuntimeError:
+        _slots.release()
+        raise
+    # El cupo se libera cuando termina el hash, aunque la solicitud ya no espere
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FuturesTimeoutError:
+        raise APIException(
+            "Servidor ocupado, intenta de nuevo en unos segundos", status_code=503)
+
+
+def hashes_per_second(method, seconds):
+    # Hashes por segundo en un solo nucleo; se usa desde `flask bench-password-hash`
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        generate_password_hash("contraseña de prueba", method=method)
+        count += 1
+    return count / (time.perf_counter() - start)
@@ -0,0 +1,113 @@
+"""
+Capa de consultas para expedientes medicos.
+Centraliza las estrategias de carga (selectinload/joinedload) por vista para
+evitar consultas N+1 cuando se serializan listas grandes de expedientes.
+"""
+from sqlalchemy import select, or_, text
+from sqlalchemy.orm import joinedload, raiseload
+from api.models import db, MedicalFile, UserRole
+
+
+# -------------------- ESTRATEGIAS DE CARGA POR VISTA --------------------
+# "list": solo columnas de MedicalFile; cualquier acceso a una relacion falla
+#         en lugar de disparar una consulta por fila.
+# "detail": el expediente completo con usuarios y los cinco antecedentes; todas
+#           son relaciones uno a uno, asi que un solo SELECT con LEFT JOINs.
+MEDICAL_FILE_LOAD_OPTIONS = {
+    "list": (
+        raiseload("*"),
+    ),
+    "detail": (
+        joinedload(MedicalFile.user),
+        joinedload(MedicalFile.creator),
+        joinedload(MedicalFile.supervisor),
+        joinedload(MedicalFile.personal_data),
+        joinedload(MedicalFile.pathological_background),
+        joinedload(MedicalFile.family_background),
+        joinedload(MedicalFile.non_pathological_background),
+        joinedload(MedicalFile.gynecological_background),
+    ),
+}
+
+
+def medical_files_query(view="list"):
+    # Devuelve un SELECT de MedicalFile con las opciones de carga de la vista
+    return select(MedicalFile).options(*MEDICAL_FILE_LOAD_OPTIONS[view])
+
+
+def medical_file_filters(status=None, created_by=None, supervised_by=None,
+                         created_from=None, created_to=None):
+    # Condiciones WHERE opcionales; el rango de fechas es [created_from, created_to)
+    conditions = []
+    if status is not None:
+        conditions.append(MedicalFile.status == status)
+    if created_by is not None:
+        conditions.append(MedicalFile.created_by == created_by)
+    if supervised_by is not None:
+        conditions.append(MedicalFile.supervised_by == supervised_by)
+    if created_from is not None:
+        conditions.append(MedicalFile.created_at >= created_from)
+    if created_to is not None:
+        conditions.append(MedicalFile.created_at < created_to)
+    return conditions
+
+
+def visible_medical_files(user_id, role):
+    # Condicion con los expedientes propios, creados o supervisados segun el rol;
+    # None para el administrador, que ve todos
+    if role == UserRole.admin:
+        return None
+    conditions = [MedicalFile.user_id == user_id]
+    if role in (UserRole.estudiante, UserRole.profesional):
+        conditions.append(MedicalFile.created_by == user_id)
+    if role == UserRole.profesional:
+        conditions.append(MedicalFile.supervised_by == user_id)
+    return or_(*conditions)
+
+
+def role_medical_files_query(user_id, role, view="list"):
+    # Expedientes propios, creados o supervisados segun el rol (no administrador)
+    return medical_files_query(view).where(
+        visible_medical_files(user_id, role)).order_by(MedicalFile.id)
+
+
+def medical_files_for_role(user_id, role, view="list"):
+    """
+    Obtiene en una sola consulta todos los expedientes visibles para un rol y
+    los reparte en los mismos grupos que devuelve GET /api/medical_files.
+    """
+    files = {}
+
+    if role == UserRole.admin:
+        stmt = medical_files_query(view).order_by(MedicalFile.id)
+        files["all_files"] = db.session.scalars(stmt).all()
+        return files
+
+    rows = db.session.scalars(role_medical_files_query(user_id, role, view)).all()
+
+    # Un mismo expediente puede aparecer en varios grupos, igual que antes
+    files["own_file"] = next(
+        (file for file in rows if file.user_id == user_id), None)
+    if role in (UserRole.estudiante, UserRole.profesional):
+        files["created_files"] = [
+            file for file in rows if file.created_by == user_id]
+    if role == UserRole.profesional:
+        files["supervised_files"] = [
+            file for file in rows if file.supervised_by == user_id]
+
+    return files
+
+
+def explain(session, stmt, analyze=False):
+    # Devuelve el plan de ejecucion de un SELECT como lista de lineas de texto
+    dialect = session.get_bind().dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+        rows = session.execute(text(prefix + sql)).all()
+        return [row[0] for row in rows]
+    if dialect.name == "sqlite":
+        rows = session.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+        return [row[-1] for row in rows]
+    rows = session.execute(text("EXPLAIN " + sql)).all()
+    return [" | ".join(str(value) for value in row) for row in rows]
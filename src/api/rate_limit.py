@@ -0,0 +1,222 @@
+"""
+Limite de solicitudes con cubetas de tokens (token bucket).
+Cada regla tiene una clave (IP del cliente o email del cuerpo) y un limite
+"N/periodo": la cubeta guarda hasta N tokens y se rellena a N por periodo, asi
+que se permiten rafagas de N y luego un ritmo sostenido. Al agotarse se
+responde 429 con Retry-After.
+
+Las cubetas viven en un backend intercambiable (RATE_LIMIT_STORAGE_URL):
+- vacio o memory://  diccionario en memoria del proceso, dividido en shards con
+                     su propio lock (un solo nodo; cada worker de gunicorn
+                     lleva su propia cuenta)
+- redis://...        Redis compartido por todos los workers y maquinas
+                     (requiere el paquete redis)
+
+Las reglas por ruta se definen en RATE_LIMITS y se pueden cambiar con
+variables de entorno, p. ej. RATE_LIMIT_LOGIN="ip=20/minute,email=5/minute".
+"""
+import os
+import threading
+import time
+from functools import wraps
+from flask import request, current_app
+from api.utils import APIException
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+RATE_LIMIT_STORAGE_URL = os.getenv("RATE_LIMIT_STORAGE_URL", "")
+# Proxies delante de la app para leer la IP real de X-Forwarded-For. Heroku (DYNO)
+# y Render (RENDER) ponen un router delante: ahi el valor por defecto es 1, si no
+# todos los clientes compartirian la cubeta de la IP del router
+BEHIND_PLATFORM_ROUTER = bool(os.getenv("DYNO") or os.getenv("RENDER"))
+RATE_LIMIT_PROXY_COUNT = int(os.getenv("RATE_LIMIT_PROXY_COUNT", "1" if BEHIND_PLATFORM_ROUTER else "0"))
+
+# Reglas por defecto de cada nombre de ruta: "clave=N/periodo" separadas por comas
+RATE_LIMITS = {
+    "login": "ip=20/minute,email=5/minute",
+    "register": "ip=5/minute",
+}
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Limit:
+    __slots__ = ("key", "capacity", "rate", "text")
+
+    def __init__(self, key, text):
+        count, _, period = text.partition("/")
+        self.key = key
+        self.capacity = float(count)
+        # Tokens por segundo
+        self.rate = self.capacity / PERIODS[period.strip().rstrip("s")]
+        self.text = text
+
+
+def parse_limits(spec):
+    # "ip=20/minute,email=5/minute" -> [Limit("ip", ...), Limit("email", ...)]
+    limits = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, text = item.partition("=")
+        if key not in KEY_FUNCTIONS:
+            raise ValueError(f"Clave de limite desconocida: {key}")
+        limits.append(Limit(key, text))
+    return limits
+
+
+_forwarded_warning = threading.Event()
+
+
+def client_ip():
+    if not RATE_LIMIT_PROXY_COUNT and "X-Forwarded-For" in request.headers:
+        # Se avisa una vez por proceso: detras de un proxy sin RATE_LIMIT_PROXY_COUNT
+        # todas las solicitudes cuentan contra la IP del proxy
+        if not _forwarded_warning.is_set():
+            _forwarded_warning.set()
+            current_app.logger.warning(
+                "Se recibió X-Forwarded-For pero RATE_LIMIT_PROXY_COUNT=0: el límite "
+                "por IP usa la dirección del proxy (%s)", request.remote_addr)
+    if RATE_LIMIT_PROXY_COUNT and request.access_route:
+        # access_route: X-Forwarded-For de izquierda a derecha mas remote_addr;
+        # solo las ultimas entradas las agregaron proxies de confianza
+        route = request.access_route
+        return route[max(len(route) - RATE_LIMIT_PROXY_COUNT - 1, 0)]
+    return request.remote_addr or "desconocida"
+
+
+def request_email():
+    data = request.get_json(silent=True)
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+KEY_FUNCTIONS = {"ip": client_ip, "email": request_email}
+
+
+class MemoryBackend:
+    """Cubetas en memoria repartidas en shards para que los hilos no compitan por un lock."""
+
+    def __init__(self, shards=16, max_keys_per_shard=10000):
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+        self.max_keys_per_shard = max_keys_per_shard
+
+    def take(self, key, rate, capacity):
+        # Devuelve 0 si hay token; si no, los segundos hasta el siguiente
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated, _ = buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            # Tercer valor: cuando la cubeta vuelve a estar llena y se puede olvidar
+            buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(buckets) > self.max_keys_per_shard:
+                for stale in [k for k, (_, _, full_at) in buckets.items() if full_at <= now]:
+                    del buckets[stale]
+        return wait
+
+    def refund(self, key, rate, capacity):
+        # Devuelve el token tomado por take() cuando otra regla rechazo la solicitud
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            state = buckets.get(key)
+            if state is None:
+                return
+            tokens, updated, _ = state
+            tokens = min(capacity, tokens + 1)
+            buckets[key] = (tokens, updated, updated + (capacity - tokens) / rate)
+
+    def clear(self):
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+
+class RedisBackend:
+    """Cubetas en Redis; el rellenado y el consumo son atomicos en un script Lua."""
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+    REFUND_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then redis.call('HSET', KEYS[1], 'tokens', math.min(capacity, tokens + 1)) end
+return 0
+"""
+
+    def __init__(self, url, prefix="rate:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL usa Redis pero el paquete redis no está instalado")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self.SCRIPT)
+        self._refund = self._client.register_script(self.REFUND_SCRIPT)
+
+    def take(self, key, rate, capacity):
+        return float(self._take(keys=[self.prefix + key], args=[capacity, rate, time.time()]))
+
+    def refund(self, key, rate, capacity):
+        self._refund(keys=[self.prefix + key], args=[capacity])
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+def create_backend(url):
+    if not url or url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"RATE_LIMIT_STORAGE_URL no soportada: {url}")
+
+
+backend = create_backend(RATE_LIMIT_STORAGE_URL)
+
+
+def rate_limit(name):
+    """
+    Aplica a una vista las reglas RATE_LIMITS[name] (o RATE_LIMIT_<NAME> del entorno).
+    Las reglas se leen al decorar, asi que un error de configuracion falla al iniciar.
+    """
+    limits = parse_limits(os.getenv(f"RATE_LIMIT_{name.upper()}", RATE_LIMITS.get(name, "")))
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT_ENABLED:
+                taken = []
+                for limit in limits:
+                    value = KEY_FUNCTIONS[limit.key]()
+                    if value is None:
+                        continue
+                    key = f"{name}:{limit.key}:{value}"
+                    wait = backend.take(key, limit.rate, limit.capacity)
+                    if wait > 0:
+                        # Una solicitud rechazada no gasta las otras cubetas: los
+                        # intentos contra un email bloqueado no agotan la de la IP
+                        for taken_key, taken_limit in taken:
+                            backend.refund(taken_key, taken_limit.rate, taken_limit.capacity)
+                        raise APIException(
+                            "Demasiadas solicitudes, intenta de nuevo más tarde",
+                            status_code=429, payload={"limit": limit.text},
+                            headers={"Retry-After": str(max(int(wait + 0.999), 1))})
+                    taken.append((key, limit))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
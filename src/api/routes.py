@@ -1,18 +1,44 @@
-from flask import request, jsonify, Blueprint
+import json
+from flask import request, jsonify, Blueprint, Response, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
-from api.models import db, User, MedicalFile, PersonalData, PathologicalBackground, FamilyBackground, GynecologicalBackground, NonPathologicalBackground, SexType
+from api.models import db, User, MedicalFile, Job, JobStatus, UserRole, UserStatus, FileStatus, SexType
 from api.utils import APIException
+from api.auth import current_user, current_role, token_claims, require_metrics_token
+from api.passwords import hash_password, verify_password, needs_rehash
+from api.queries import medical_files_for_role, medical_files_query, medical_file_filters, visible_medical_files
+from api.ingest import insert_medical_files, BULK_CHUNK_SIZE
+from api.serializers import serialize, serialize_medical_file_detail, medical_file_etag, MEDICAL_FILE_SECTIONS
+from api.schemas import SECTION_MODELS, SECTION_SCHEMAS, MEDICAL_FILE_SCHEMA
+from api.export import iter_medical_file_records, iter_ndjson
+from api.database import pool_status, replica_router
+from api.metrics import render_prometheus
+from api.versioning import check_if_match, flush_or_conflict
+from api.jobs import enqueue, async_requested, has_job_file, iter_job_file
+from api.rate_limit import rate_limit
+from api.cache import cached
+from api.pagination import keyset_page, page_size_arg, enum_arg, date_arg, encode_cursor, decode_cursor
+from api.search import search_medical_files
+from api.stats import cohort_stats, AGE_BANDS, DIMENSIONS
 from datetime import datetime, timezone, timedelta
 from flask_cors import CORS
+from sqlalchemy import select
 
 api = Blueprint('api', __name__)
 
+MAX_BULK_ITEMS = 10000
+
+# Clave de cada sección en el payload -> relación de MedicalFile que la guarda
+SECTION_RELATIONSHIPS = {
+    key: next(name for name, section_model in MEDICAL_FILE_SECTIONS if section_model is model)
+    for key, model in SECTION_MODELS.items()
+}
+
 # Allow CORS requests to this API
 CORS(api)
 
 # REGISTRO
 @api.route('/register', methods=['POST'])
+@rate_limit("register")
 def register():
     data = request.get_json()
     if not data:
@@ -29,7 +55,7 @@ def register():
     if User.query.filter_by(email=data["email"]).first():
         raise APIException("El correo ya está registrado", status_code=400)
 
-    hashed_password = generate_password_hash(data["password"])
+    hashed_password = hash_password(data["password"])
 
     new_user = User(
         names=data["names"],
@@ -51,33 +77,53 @@ def register():
 
 # LOGIN
 @api.route('/login', methods=['POST'])
+@rate_limit("login")
 def login():
     data = request.get_json()
     email = data.get("email")
     password = data.get("password")
 
     user = User.query.filter_by(email=email).first()
-    if not user or not check_password_hash(user.password, password):
+    if not user or not verify_password(user.password, password):
         raise APIException("Credenciales inválidas", status_code=401)
 
+    # Si el hash usa parámetros anteriores a los configurados, se actualiza ahora
+    # que conocemos la contraseña en claro
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
+
     # ✅ Asegúrate de que identity sea string
     access_token = create_access_token(
-        identity=str(user.id), expires_delta=timedelta(hours=1))
+        identity=str(user.id), additional_claims=token_claims(user),
+        expires_delta=timedelta(hours=1))
 
     return jsonify({"token": access_token, "user": user.serialize()}), 200
 
 # Endpoint para obtener información de todos los usuarios (solo para administradores)
 @api.route('/users', methods=['GET'])
 @jwt_required()
+@cached("users")
 def get_users():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-
-    if not current_user or current_user.role.value != "administrador":
+    # El rol viene en el token: no hace falta consultar al usuario actual
+    if current_role() != UserRole.admin:
         raise APIException("Acceso no autorizado", status_code=403)
 
-    users = User.query.all()
-    return jsonify([user.serialize() for user in users]), 200
+    # Filtros opcionales: ?role=estudiante&status=aprobado&limit=50&cursor=...
+    stmt = select(User)
+    role = enum_arg("role", UserRole)
+    if role is not None:
+        stmt = stmt.where(User.role == role)
+    status = enum_arg("status", UserStatus)
+    if status is not None:
+        stmt = stmt.where(User.status == status)
+
+    users, next_cursor = keyset_page(
+        stmt, [User.id], db.session, page_size_arg(), request.args.get("cursor"))
+    return jsonify({
+        "users": [user.serialize() for user in users],
+        "next_cursor": next_cursor
+    }), 200
 
 
 
@@ -88,42 +134,234 @@ def get_users():
 # RUTA PROTEGIDA
 @api.route('/private', methods=['GET'])
 @jwt_required()
+@cached("user:{user_id}", "user:*")
 def private():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    return jsonify({"msg": "Acceso autorizado", "user": user.serialize()}), 200
+    return jsonify({"msg": "Acceso autorizado", "user": current_user.serialize()}), 200
 
 # Enpoint para visualizar expedientes segun el rol
 @api.route('/medical_files', methods=['GET'])
 @jwt_required()
+@cached("medical_files")
 def get_medical_files():
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-
-    if not user:
-        raise APIException("Usuario no encontrado", status_code=404)
+    current_user_id = int(get_jwt_identity())
+    role = current_role()
+
+    # El administrador recibe todos los expedientes paginados por cursor
+    # (?limit=&cursor=) y con filtros opcionales:
+    # ?status=&created_by=&supervised_by=&created_from=&created_to=
+    if role == UserRole.admin:
+        stmt = medical_files_query().where(*medical_file_filters(
+            status=enum_arg("status", FileStatus),
+            created_by=request.args.get("created_by", type=int),
+            supervised_by=request.args.get("supervised_by", type=int),
+            created_from=date_arg("created_from"),
+            created_to=date_arg("created_to")))
+        all_files, next_cursor = keyset_page(
+            stmt, [MedicalFile.id], db.session, page_size_arg(),
+            request.args.get("cursor"), descending=True)
+        return jsonify({
+            "all_files": [file.serialize() for file in all_files],
+            "next_cursor": next_cursor
+        }), 200
+
+    # Una sola consulta para todos los grupos de expedientes del rol
+    files = medical_files_for_role(current_user_id, role)
+
+    response = {}
+    for key, value in files.items():
+        if isinstance(value, list):
+            response[key] = [file.serialize() for file in value]
+        else:
+            response[key] = value.serialize() if value else None
+
+    return jsonify(response), 200
+
+# Endpoint para buscar texto en los antecedentes patológicos y no patológicos
+# ?q=diabetes insulina&limit=&cursor= ; resultados ordenados por relevancia.
+# Cada rol solo encuentra los expedientes que puede ver en GET /api/medical_files.
+@api.route('/medical-files/search', methods=['GET'])
+@jwt_required()
+@cached("medical_files", "backgrounds")
+def search_medical_files_text():
+    role = current_role()
+    if role == UserRole.paciente:
+        raise APIException("Acceso no autorizado", status_code=403)
+    query = request.args.get("q", "").strip()
+    if not query:
+        raise APIException("El parámetro q es obligatorio", status_code=400)
+
+    offset = 0
+    cursor = request.args.get("cursor")
+    if cursor:
+        offset = decode_cursor(cursor)
+        if not isinstance(offset, int) or offset < 0:
+            raise APIException("Cursor inválido", status_code=400)
+    limit = page_size_arg()
+    ranked, has_more = search_medical_files(
+        db.session, query, visible_medical_files(int(get_jwt_identity()), role), offset, limit)
 
     files = {}
+    if ranked:
+        files = {file.id: file for file in db.session.scalars(medical_files_query().where(
+            MedicalFile.id.in_([file_id for file_id, _ in ranked])))}
+    return jsonify({
+        "results": [dict(files[file_id].serialize(), rank=round(rank, 6))
+                    for file_id, rank in ranked if file_id in files],
+        "next_cursor": encode_cursor(offset + limit) if has_more else None
+    }), 200
+
+# Endpoint con la prevalencia de los antecedentes heredofamiliares por cohorte
+# (administradores y profesionales). Filtros opcionales ?sex=&age_band=&status=
+# y ?group_by=sex|age_band|status para desglosar; se responde desde los conteos
+# precalculados de api/stats.py sin recorrer los expedientes.
+@api.route('/stats/family-background', methods=['GET'])
+@jwt_required()
+@cached("medical_files", "backgrounds")
+def family_background_stats():
+    if current_role() not in (UserRole.admin, UserRole.profesional):
+        raise APIException("Acceso no autorizado", status_code=403)
+
+    age_band = request.args.get("age_band")
+    if age_band is not None and age_band not in [label for _, label in AGE_BANDS]:
+        raise APIException("Valor inválido en el parámetro age_band", status_code=400)
+    group_by = request.args.get("group_by")
+    if group_by is not None and group_by not in DIMENSIONS:
+        raise APIException("Valor inválido en el parámetro group_by", status_code=400)
+    sex = enum_arg("sex", SexType)
+    status = enum_arg("status", FileStatus)
+    filters = {
+        "sex": sex.value if sex else None,
+        "age_band": age_band,
+        "status": status.value if status else None,
+    }
+    return jsonify(dict(cohort_stats(db.session, filters, group_by),
+                        filters={key: value for key, value in filters.items() if value})), 200
+
+# Endpoint para obtener un expediente completo con sus cinco antecedentes
+# Visible para administradores y para el paciente, creador o supervisor del expediente.
+# Responde 304 sin serializar cuando el ETag enviado en If-None-Match sigue vigente.
+@api.route('/medical-file/<int:file_id>', methods=['GET'])
+@jwt_required()
+@cached("medical_file:{file_id}", "medical_file:*", "users")
+def get_medical_file(file_id):
+    medical_file = db.session.scalars(
+        medical_files_query("detail").where(MedicalFile.id == file_id)).first()
+    if medical_file is None:
+        raise APIException("Expediente no encontrado", status_code=404)
+
+    current_user_id = int(get_jwt_identity())
+    if current_role() != UserRole.admin and current_user_id not in (
+            medical_file.user_id, medical_file.created_by, medical_file.supervised_by):
+        raise APIException("Acceso no autorizado", status_code=403)
 
-    if user.role == "administrador":
-        all_files = MedicalFile.query.all()
-        files["all_files"] = [file.serialize() for file in all_files]
-        return jsonify(files), 200
+    etag = medical_file_etag(medical_file)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(serialize_medical_file_detail(medical_file))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# Endpoint para cambiar el estado de un expediente (administradores o el supervisor)
+# Acepta If-Match con el ETag del detalle; si el expediente cambió responde 409
+# con el ETag vigente. Devuelve el nuevo ETag para encadenar actualizaciones.
+@api.route('/medical-file/<int:file_id>/status', methods=['PUT'])
+@jwt_required()
+def update_medical_file_status(file_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        status = FileStatus(data.get("status"))
+    except ValueError:
+        raise APIException("Estado de expediente inválido", status_code=400)
+
+    medical_file = db.session.scalars(
+        medical_files_query("detail").where(MedicalFile.id == file_id)).first()
+    if medical_file is None:
+        raise APIException("Expediente no encontrado", status_code=404)
+    if current_role() != UserRole.admin and int(get_jwt_identity()) != medical_file.supervised_by:
+        raise APIException("Acceso no autorizado", status_code=403)
+
+    check_if_match(medical_file_etag(medical_file))
+
+    now = datetime.now(timezone.utc)
+    medical_file.status = status
+    medical_file.supervised_at = now
+    if status == FileStatus.confirmado:
+        medical_file.confirmed_at = now
+    flush_or_conflict()
+    etag, version = medical_file_etag(medical_file), medical_file.version
+    db.session.commit()
 
-    own_file = MedicalFile.query.filter_by(user_id=user.id).first()
-    files["own_file"] = own_file.serialize() if own_file else None
+    response = jsonify({"message": "Estado actualizado", "status": status.value,
+                        "version": version})
+    response.set_etag(etag)
+    return response
+
+# Endpoint para corregir una sección de un expediente con un diff parcial
+# <section> es una clave del payload de creación: personal_data, pathological,
+# family, non_pathological o gynecological. Solo se validan las claves enviadas
+# y el UPDATE incluye únicamente las columnas cuyo valor cambió.
+# Acepta If-Match con el ETag del detalle y responde 409 si hubo otra edición.
+@api.route('/medical-file/<int:file_id>/<section>', methods=['PATCH'])
+@jwt_required()
+def patch_medical_file_section(file_id, section):
+    schema = SECTION_SCHEMAS.get(section)
+    if schema is None:
+        raise APIException("Sección no encontrada", status_code=404)
+    values, errors = schema.validate(request.get_json(silent=True), partial=True)
+    if errors:
+        raise APIException("Datos inválidos", status_code=400, payload={"errors": errors})
+
+    medical_file = db.session.scalars(
+        medical_files_query("detail").where(MedicalFile.id == file_id)).first()
+    if medical_file is None:
+        raise APIException("Expediente no encontrado", status_code=404)
+    if current_role() != UserRole.admin and int(get_jwt_identity()) not in (
+            medical_file.created_by, medical_file.supervised_by):
+        raise APIException("Acceso no autorizado", status_code=403)
+    row = getattr(medical_file, SECTION_RELATIONSHIPS[section])
+    if row is None:
+        raise APIException("Sección no encontrada", status_code=404)
 
-    if user.role in ["estudiante", "profesional"]:
-        created_files = MedicalFile.query.filter_by(created_by=user.id).all()
-        files["created_files"] = [file.serialize() for file in created_files]
+    check_if_match(medical_file_etag(medical_file))
 
-    if user.role == "profesional":
-        supervised_files = MedicalFile.query.filter_by(
-            supervised_by=user.id).all()
-        files["supervised_files"] = [file.serialize()
-                                     for file in supervised_files]
+    changed = [key for key, value in values.items() if getattr(row, key) != value]
+    for key in changed:
+        setattr(row, key, values[key])
+    flush_or_conflict()
+    etag, data = medical_file_etag(medical_file), serialize(row)
+    db.session.commit()
 
-    return jsonify(files), 200
+    response = jsonify({"message": "Sección actualizada", "changed": changed, section: data})
+    response.set_etag(etag)
+    return response
+
+# Endpoint para exportar todos los expedientes con sus antecedentes (solo administradores)
+# Responde en NDJSON (un expediente por línea) y en streaming, sin cargar todo en memoria
+@api.route('/medical_files/export', methods=['GET'])
+@jwt_required()
+def export_medical_files():
+    if current_role() != UserRole.admin:
+        raise APIException("Acceso no autorizado", status_code=403)
+
+    records = iter_medical_file_records(db.session)
+    return Response(
+        stream_with_context(iter_ndjson(records)),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=medical_files.ndjson"}
+    )
+
+# Endpoint para encolar la exportación NDJSON como trabajo en segundo plano
+# El archivo se descarga al terminar desde GET /api/jobs/<id>/download
+@api.route('/medical_files/export', methods=['POST'])
+@jwt_required()
+def enqueue_medical_files_export():
+    if current_role() != UserRole.admin:
+        raise APIException("Acceso no autorizado", status_code=403)
+    return job_accepted(enqueue(db.session, "export_medical_files", {},
+                                created_by=int(get_jwt_identity())))
 
 # Endpoint para crear un expediente médico
 # Crea un expediente medico y asigna el usuario actual como creador, 
@@ -198,117 +436,160 @@ def create_medical_file():
         }           
     }
     """
-    data = request.get_json()
+    # 0. Validar todo el payload antes de tocar la base de datos
+    data, errors = MEDICAL_FILE_SCHEMA.validate(request.get_json(silent=True))
+    if errors:
+        raise APIException("Datos inválidos", status_code=400, payload={"errors": errors})
 
     # 1. Crear el expediente médico
+    now = datetime.now(timezone.utc)
     medical_file = MedicalFile(
         user_id=data["user_id"],
         supervised_by=data["supervised_by"],
-        supervised_at=datetime.now(timezone.utc),
+        supervised_at=now,
         created_by=data["created_by"],
-        created_at=datetime.now(timezone.utc),
-        confirmed_at=datetime.now(timezone.utc),
-        status="revision"
+        created_at=now,
+        confirmed_at=now,
+        status=FileStatus.revision
     )
     db.session.add(medical_file)
     db.session.flush()  # Para obtener el ID antes de commit
 
-    # 2. Crear los datos personales
-    personal_data = PersonalData(
-        user_id=data["user_id"],
-        medical_file_id=medical_file.id,
-        full_name=data["personal_data"]["full_name"],
-        paternal_surname=data["personal_data"]["paternal_surname"],
-        maternal_surname=data["personal_data"].get("maternal_surname"),
-        sex=data["personal_data"]["sex"],
-        birth_date=data["personal_data"]["birth_date"],
-        address=data["personal_data"]["address"],
-        phone=data["personal_data"]["phone"]
-    )
-    db.session.add(personal_data)
+    # 2. Crear datos personales y antecedentes (ginecológicos solo si es femenino)
+    for key, model in SECTION_MODELS.items():
+        if key in data:
+            db.session.add(model(user_id=data["user_id"],
+                                 medical_file_id=medical_file.id, **data[key]))
 
-    # 3. Crear antecedentes patológicos
-    pathological = PathologicalBackground(
-        user_id=data["user_id"],
-        medical_file_id=medical_file.id,
-        personal_diseases=data["pathological"]["personal_diseases"],
-        medications=data["pathological"]["medications"],
-        hospitalizations=data["pathological"]["hospitalizations"],
-        surgeries=data["pathological"]["surgeries"],
-        traumatisms=data["pathological"]["traumatisms"],
-        transfusions=data["pathological"]["transfusions"],
-        allergies=data["pathological"]["allergies"],
-        others=data["pathological"]["others"]
-    )
-    db.session.add(pathological)
+    db.session.commit()
+    return jsonify({"msg": "Expediente médico creado", "medical_file_id": medical_file.id}), 201
 
-    # 4. Crear antecedentes familiares
-    family = FamilyBackground(
-        user_id=data["user_id"],
-        medical_file_id=medical_file.id,
-        hypertension=data["family"]["hypertension"],
-        diabetes=data["family"]["diabetes"],
-        cancer=data["family"]["cancer"],
-        heart_disease=data["family"]["heart_disease"],
-        kidney_disease=data["family"]["kidney_disease"],
-        liver_disease=data["family"]["liver_disease"],
-        mental_illness=data["family"]["mental_illness"],
-        congenital_malformations=data["family"]["congenital_malformations"],
-        others=data["family"]["others"]
-    )
-    db.session.add(family)
 
-    # 5. Crear antecedentes no patológicos
-    non_pathological = NonPathologicalBackground(
-        user_id=data["user_id"],
-        medical_file_id=medical_file.id,
-        education_level=data["non_pathological"]["education_level"],
-        economic_activity=data["non_pathological"]["economic_activity"],
-        marital_status=data["non_pathological"]["marital_status"],
-        dependents=data["non_pathological"]["dependents"],
-        occupation=data["non_pathological"]["occupation"],
-        recent_travels=data["non_pathological"]["recent_travels"],
-        social_activities=data["non_pathological"]["social_activities"],
-        exercise=data["non_pathological"]["exercise"],
-        diet_supplements=data["non_pathological"]["diet_supplements"],
-        hygiene=data["non_pathological"]["hygiene"],
-        tattoos=data["non_pathological"]["tattoos"],
-        piercings=data["non_pathological"]["piercings"],
-        hobbies=data["non_pathological"]["hobbies"],
-        tobacco_use=data["non_pathological"]["tobacco_use"],
-        alcohol_use=data["non_pathological"]["alcohol_use"],
-        recreational_drugs=data["non_pathological"]["recreational_drugs"],
-        addictions=data["non_pathological"]["addictions"],
-        otherS=data["non_pathological"]["otherS"]
+# Endpoint para crear expedientes médicos en lote
+# Recibe un arreglo JSON de payloads (mismo formato que POST /medical-file) o un
+# cuerpo NDJSON (Content-Type: application/x-ndjson) con un payload por línea.
+# Responde con el resultado de cada elemento: medical_file_id o error.
+# Con ?async=true la carga se encola y el resultado queda en GET /api/jobs/<id>.
+@api.route("/medical-files/bulk", methods=["POST"])
+@jwt_required()
+def bulk_create_medical_files():
+    if request.mimetype == "application/x-ndjson":
+        payloads = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                payloads.append(json.loads(line))
+            except ValueError:
+                payloads.append(None)
+    else:
+        payloads = request.get_json(silent=True)
+        if not isinstance(payloads, list):
+            raise APIException(
+                "El cuerpo debe ser un arreglo JSON o NDJSON", status_code=400)
+
+    if len(payloads) > MAX_BULK_ITEMS:
+        raise APIException(
+            f"Máximo {MAX_BULK_ITEMS} expedientes por solicitud", status_code=413)
+
+    chunk_size = max(request.args.get("chunk_size", BULK_CHUNK_SIZE, type=int), 1)
+    if async_requested():
+        return job_accepted(enqueue(
+            db.session, "import_medical_files",
+            {"payloads": payloads, "chunk_size": chunk_size},
+            created_by=int(get_jwt_identity())))
+    results = insert_medical_files(db.session, payloads, chunk_size)
+    created = sum(1 for result in results if "medical_file_id" in result)
+
+    return jsonify({
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }), 201 if created == len(results) else 207
+
+
+def job_accepted(job):
+    response = jsonify({"message": "Trabajo encolado", "job": job.serialize()})
+    response.status_code = 202
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return response
+
+
+def get_job_or_404(job_id):
+    # Cada usuario ve sus propios trabajos; los administradores ven todos
+    job = db.session.get(Job, job_id)
+    if job is None:
+        raise APIException("Trabajo no encontrado", status_code=404)
+    if current_role() != UserRole.admin and job.created_by != int(get_jwt_identity()):
+        raise APIException("Acceso no autorizado", status_code=403)
+    return job
+
+
+# Endpoint con el estado de un trabajo en segundo plano y su resultado
+@api.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    return jsonify(get_job_or_404(job_id).serialize()), 200
+
+
+# Endpoint para descargar el archivo generado por un trabajo de exportación
+@api.route('/jobs/<int:job_id>/download', methods=['GET'])
+@jwt_required()
+def download_job_file(job_id):
+    job = get_job_or_404(job_id)
+    if job.kind != "export_medical_files" or job.status != JobStatus.completado:
+        raise APIException("El trabajo no tiene un archivo disponible", status_code=409)
+    if not has_job_file(db.session, job.id):
+        raise APIException("El archivo de la exportación ya no está disponible", status_code=410)
+    return Response(
+        stream_with_context(iter_job_file(db.session, job.id)),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=medical_files.ndjson"}
     )
-    db.session.add(non_pathological)
-
-    # 6. Si es femenino, crear antecedentes ginecológicos
-    if data["personal_data"]["sex"] == SexType.femenino.value:
-        gyneco = GynecologicalBackground(
-            user_id=data["user_id"],
-            medical_file_id=medical_file.id,
-            menarche_age=data["gynecological"]["menarche_age"],
-            pregnancies=data["gynecological"]["pregnancies"],
-            births=data["gynecological"]["births"],
-            c_sections=data["gynecological"]["c_sections"],
-            abortions=data["gynecological"]["abortions"],
-            contraceptive_method=data["gynecological"]["contraceptive_method"],
-            others=data["gynecological"]["others"]
-        )
-        db.session.add(gyneco)
 
-    db.session.commit()
-    return jsonify({"msg": "Expediente médico creado", "medical_file_id": medical_file.id}), 201
+
+def all_engines():
+    # Motor principal (y binds) mas las replicas de lectura configuradas
+    router = replica_router()
+    return [*db.engines.values(), *(router.engines if router else [])]
+
+# Endpoint con el estado del pool de conexiones de cada motor de base de datos
+# y la salud de las replicas. Requiere la cabecera X-Metrics-Token (METRICS_TOKEN) o un JWT de administrador
+@api.route('/metrics/pool', methods=['GET'])
+def pool_metrics():
+    require_metrics_token()
+    router = replica_router()
+    return jsonify({
+        "pools": [pool_status(engine) for engine in all_engines()],
+        "replicas": [replica.status() for replica in router.replicas] if router else []
+    }), 200
+
+
+# Endpoint de métricas en formato de texto de Prometheus: latencia, número de
+# sentencias SQL, tiempo en base de datos y tamaño de respuesta por ruta, más el pool.
+# Mismo acceso que /metrics/pool: X-Metrics-Token (METRICS_TOKEN) o JWT de administrador
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    require_metrics_token()
+    return Response(render_prometheus(all_engines()),
+                    mimetype="text/plain; version=0.0.4")
 
 
 # Endpoint para eliminar un usuario (solo administradores)
+# Con ?async=true responde 202 con el trabajo encolado en lugar de borrar en la solicitud
 @api.route('/user/<int:user_id>', methods=['DELETE'])
 @jwt_required()
 def delete_user(user_id):
+    if current_role() != UserRole.admin:
+        raise APIException("Acceso no autorizado", status_code=403)
+
     user = db.session.get(User, user_id)
     if user is None:
         return jsonify({"message": "Usuario no encontrado"}), 404
+    # Con ?async=true el borrado en cascada lo hace `flask worker`
+    if async_requested():
+        return job_accepted(enqueue(db.session, "delete_user", {"user_id": user_id},
+                                    created_by=int(get_jwt_identity())))
     db.session.delete(user)
     db.session.commit()
     return jsonify({"message": "Usuario eliminado"}), 200
@@ -0,0 +1,201 @@
+"""
+Validacion de payloads derivada de los modelos.
+Cada ModelSchema se compila una sola vez al importar el modulo: por columna
+editable guarda una funcion de conversion segun su tipo (texto con longitud
+maxima, booleano, entero, fecha ISO o enum) y si admite nulos. Validar un
+payload es recorrer un diccionario y reunir todos los errores, sin consultas.
+"""
+from datetime import date, datetime
+from sqlalchemy import Boolean, Date, DateTime, Enum, Integer, String
+from api.models import (
+    PersonalData,
+    PathologicalBackground,
+    FamilyBackground,
+    GynecologicalBackground,
+    NonPathologicalBackground,
+    SexType
+)
+
+# Secciones del payload de un expediente y el modelo que las guarda
+SECTION_MODELS = {
+    "personal_data": PersonalData,
+    "pathological": PathologicalBackground,
+    "family": FamilyBackground,
+    "non_pathological": NonPathologicalBackground,
+    "gynecological": GynecologicalBackground,
+}
+
+# Columnas que no vienen en la seccion: las completa el servidor
+MANAGED_COLUMNS = ("id", "user_id", "medical_file_id", "version")
+
+
+def _text(max_length):
+    def convert(value):
+        # Algunos formularios envian numeros o booleanos en columnas de texto
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        elif isinstance(value, (int, float)):
+            value = str(value)
+        elif not isinstance(value, str):
+            raise ValueError("Debe ser texto")
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f"Máximo {max_length} caracteres")
+        return value
+    return convert
+
+
+def _boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError("Debe ser verdadero o falso")
+    return value
+
+
+def _integer(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError("Debe ser un número entero")
+    return value
+
+
+def _date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError("Debe ser una fecha con formato AAAA-MM-DD")
+
+
+def _datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError("Debe ser una fecha y hora en formato ISO")
+
+
+def _enum(enum_class):
+    members = {member.value: member for member in enum_class}
+    members.update({member.name: member for member in enum_class})
+    allowed = ", ".join(member.value for member in enum_class)
+
+    def convert(value):
+        try:
+            return members[value]
+        except (KeyError, TypeError):
+            raise ValueError(f"Debe ser uno de: {allowed}")
+    return convert
+
+
+def _converter(column_type):
+    # Enum y Boolean antes que String/Integer: en SQLAlchemy Enum hereda de String
+    if isinstance(column_type, Enum):
+        return _enum(column_type.enum_class)
+    if isinstance(column_type, Boolean):
+        return _boolean
+    if isinstance(column_type, Integer):
+        return _integer
+    if isinstance(column_type, DateTime):
+        return _datetime
+    if isinstance(column_type, Date):
+        return _date
+    if isinstance(column_type, String):
+        return _text(column_type.length)
+    return lambda value: value
+
+
+class ModelSchema:
+    """Validador compilado de las columnas editables de un modelo."""
+    __slots__ = ("model", "fields")
+
+    def __init__(self, model, exclude=MANAGED_COLUMNS):
+        self.model = model
+        # clave -> (conversion, admite nulos, obligatoria al crear)
+        self.fields = {
+            column.key: (_converter(column.type), column.nullable,
+                         not column.nullable and column.default is None)
+            for column in model.__table__.columns if column.key not in exclude
+        }
+
+    def validate(self, data, partial=False):
+        """
+        Devuelve (valores convertidos, errores por campo). Con partial=True solo
+        se validan las claves presentes (PATCH); si no, faltar una obligatoria es error.
+        """
+        if not isinstance(data, dict):
+            return {}, {"_schema": "Debe ser un objeto JSON"}
+        values, errors = {}, {}
+        for key, value in data.items():
+            field = self.fields.get(key)
+            if field is None:
+                errors[key] = "Campo desconocido"
+                continue
+            convert, nullable, _ = field
+            if value is None:
+                if nullable:
+                    values[key] = None
+                else:
+                    errors[key] = "No puede ser nulo"
+                continue
+            try:
+                values[key] = convert(value)
+            except ValueError as error:
+                errors[key] = str(error)
+        if not partial:
+            for key, (_, _, required) in self.fields.items():
+                if required and key not in data:
+                    errors[key] = "Campo obligatorio"
+        return values, errors
+
+
+SECTION_SCHEMAS = {key: ModelSchema(model) for key, model in SECTION_MODELS.items()}
+
+
+class MedicalFileSchema:
+    """
+    Payload de POST /api/medical-file: ids del paciente, creador y supervisor
+    mas una seccion por antecedente. La seccion ginecologica solo se exige (y se
+    valida) para pacientes de sexo femenino, igual que al guardarla.
+    """
+    FILE_FIELDS = ("user_id", "created_by", "supervised_by")
+    REQUIRED_SECTIONS = ("personal_data", "pathological", "family", "non_pathological")
+
+    def __init__(self, section_schemas):
+        self.section_schemas = section_schemas
+        self.known_keys = set(self.FILE_FIELDS) | set(section_schemas)
+
+    def validate(self, data):
+        """Devuelve (payload convertido, errores); los errores de cada seccion van anidados."""
+        if not isinstance(data, dict):
+            return {}, {"_schema": "Debe ser un objeto JSON"}
+        values, errors = {}, {}
+        for key in self.FILE_FIELDS:
+            if data.get(key) is None:
+                errors[key] = "Campo obligatorio"
+            else:
+                try:
+                    values[key] = _integer(data[key])
+                except ValueError as error:
+                    errors[key] = str(error)
+
+        sections = list(self.REQUIRED_SECTIONS)
+        personal_data = data.get("personal_data")
+        if isinstance(personal_data, dict) and personal_data.get("sex") in (
+                SexType.femenino.value, SexType.femenino.name):
+            sections.append("gynecological")
+        for key in sections:
+            if key not in data:
+                errors[key] = "Sección obligatoria"
+                continue
+            section, section_errors = self.section_schemas[key].validate(data[key])
+            if section_errors:
+                errors[key] = section_errors
+            else:
+                values[key] = section
+
+        for key in data.keys() - self.known_keys:
+            errors[key] = "Campo desconocido"
+        return values, errors
+
+
+MEDICAL_FILE_SCHEMA = MedicalFileSchema(SECTION_SCHEMAS)
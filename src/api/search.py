@@ -0,0 +1,245 @@
+"""
+Busqueda de texto completo en los antecedentes de los expedientes.
+Cada expediente tiene un documento en `medical_file_search` con el texto libre
+de sus antecedentes patologicos y no patologicos. El documento se actualiza en
+la misma transaccion en que cambian esos antecedentes:
+- por el ORM (crear, PATCH, borrar), con eventos de la sesion
+- por inserciones masivas (ingest/seed), llamando a refresh_documents()
+
+Con PostgreSQL la consulta usa to_tsvector/websearch_to_tsquery en español
+sobre un indice GIN y ordena por ts_rank. Con otros motores (SQLite en local)
+se usa un indice invertido en memoria del proceso, con ranking BM25, que se
+sincroniza con la tabla antes de cada busqueda.
+"""
+import math
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import Text, String, select, delete, insert, func, literal_column, event
+from sqlalchemy.orm import Session
+from api.models import (
+    MedicalFile,
+    MedicalFileSearch,
+    PathologicalBackground,
+    NonPathologicalBackground
+)
+
+# Modelos cuyo texto libre entra en el documento de busqueda
+SEARCH_MODELS = (PathologicalBackground, NonPathologicalBackground)
+SEARCH_COLUMNS = {
+    model: [column for column in model.__table__.columns
+            if isinstance(column.type, (Text, String))]
+    for model in SEARCH_MODELS
+}
+SEARCH_CONFIG = "spanish"
+
+
+# -------------------- DOCUMENTOS --------------------
+def refresh_documents(session, medical_file_ids):
+    """Reescribe (o elimina si ya no hay texto) el documento de cada expediente."""
+    ids = sorted(set(medical_file_ids))
+    if not ids:
+        return
+    texts = {file_id: [] for file_id in ids}
+    for model, columns in SEARCH_COLUMNS.items():
+        stmt = select(model.medical_file_id, *columns).where(model.medical_file_id.in_(ids))
+        for file_id, *values in session.execute(stmt):
+            texts[file_id].extend(value for value in values if value)
+
+    now = datetime.now(timezone.utc)
+    session.execute(delete(MedicalFileSearch).where(MedicalFileSearch.medical_file_id.in_(ids)))
+    rows = [{"medical_file_id": file_id, "document": " ".join(parts), "updated_at": now}
+            for file_id, parts in texts.items() if parts]
+    if rows:
+        session.execute(insert(MedicalFileSearch), rows)
+
+
+def rebuild_documents(session, batch_size=1000):
+    # Recalcula todos los documentos por lotes de expedientes; devuelve cuantos procesó
+    count, last_id = 0, 0
+    while True:
+        ids = session.scalars(select(MedicalFile.id).where(MedicalFile.id > last_id)
+                              .order_by(MedicalFile.id).limit(batch_size)).all()
+        if not ids:
+            return count
+        refresh_documents(session, ids)
+        session.commit()
+        count += len(ids)
+        last_id = ids[-1]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_files(session, flush_context):
+    # Expedientes cuyos antecedentes cambiaron en este flush
+    changed = session.info.setdefault("search_changed", set())
+    removed = session.info.setdefault("search_removed", set())
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, SEARCH_MODELS) and obj.medical_file_id is not None:
+            changed.add(obj.medical_file_id)
+        elif isinstance(obj, MedicalFile) and obj in session.deleted:
+            removed.add(obj.id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _update_documents(session, flush_context):
+    changed = session.info.pop("search_changed", set())
+    removed = session.info.pop("search_removed", set())
+    if removed:
+        session.execute(delete(MedicalFileSearch)
+                        .where(MedicalFileSearch.medical_file_id.in_(removed)))
+    changed -= removed
+    if changed:
+        refresh_documents(session, changed)
+
+
+# -------------------- INDICE EN MEMORIA (SQLite y otros) --------------------
+# Documentos confirmados despues de otro con updated_at mayor (transacciones
+# largas) se vuelven a leer si su updated_at cae en este margen
+SYNC_MARGIN = timedelta(seconds=60)
+STOPWORDS = frozenset(
+    "a al algo con de del el en es la las lo los no o para por que se sin su sus un una y".split())
+TOKEN = re.compile(r"\w+")
+
+
+def _strip_accents(text):
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in normalized if not unicodedata.combining(char))
+
+
+def terms(text):
+    # Minusculas sin acentos, sin palabras vacias y sin plural (-es/-s) como raiz minima
+    for word in TOKEN.findall(_strip_accents(text)):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("es"):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        yield word
+
+
+class InvertedIndex:
+    """Indice invertido termino -> {expediente: frecuencia} con ranking BM25."""
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = {}
+        # expediente -> terminos distintos, para poder sacarlo de postings
+        self.documents = {}
+        self.lengths = {}
+        # Suma de los ids en memoria: junto con el total detecta borrados en la tabla
+        self.id_sum = 0
+        self.synced_at = None
+
+    def _remove(self, file_id):
+        for term in self.documents.pop(file_id, ()):
+            documents = self.postings[term]
+            del documents[file_id]
+            if not documents:
+                del self.postings[term]
+        if self.lengths.pop(file_id, None) is not None:
+            self.id_sum -= file_id
+
+    def _add(self, file_id, document):
+        frequencies = {}
+        for term in terms(document):
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[file_id] = frequency
+        self.documents[file_id] = tuple(frequencies)
+        self.lengths[file_id] = sum(frequencies.values())
+        self.id_sum += file_id
+
+    def _load(self, session, condition):
+        for file_id, document in session.execute(
+                select(MedicalFileSearch.medical_file_id, MedicalFileSearch.document).where(condition)):
+            self._remove(file_id)
+            self._add(file_id, document)
+
+    def sync(self, session):
+        """
+        Incorpora los documentos nuevos o modificados desde la ultima sincronizacion
+        (menos SYNC_MARGIN) y, si el total o la suma de ids no coinciden con la
+        tabla, compara los ids para quitar los borrados y leer los que falten.
+        """
+        with self._lock:
+            total, id_sum, latest = session.execute(select(
+                func.count(), func.coalesce(func.sum(MedicalFileSearch.medical_file_id), 0),
+                func.max(MedicalFileSearch.updated_at))).one()
+            if self.synced_at is None:
+                self._load(session, MedicalFileSearch.medical_file_id.isnot(None))
+            else:
+                self._load(session, MedicalFileSearch.updated_at >= self.synced_at - SYNC_MARGIN)
+            if total != len(self.lengths) or id_sum != self.id_sum:
+                present = set(session.scalars(select(MedicalFileSearch.medical_file_id)))
+                for file_id in set(self.lengths) - present:
+                    self._remove(file_id)
+                missing = sorted(present - self.lengths.keys())
+                for start in range(0, len(missing), 500):
+                    self._load(session, MedicalFileSearch.medical_file_id.in_(missing[start:start + 500]))
+            if latest is not None:
+                self.synced_at = latest
+
+    def search(self, query):
+        # Todos los terminos deben aparecer; devuelve [(expediente, puntaje)] de mayor a menor
+        query_terms = list(dict.fromkeys(terms(query)))
+        with self._lock:
+            if not query_terms or any(term not in self.postings for term in query_terms):
+                return []
+            candidates = set.intersection(*(set(self.postings[term]) for term in query_terms))
+            total = len(self.lengths)
+            average = sum(self.lengths.values()) / total
+            scores = {}
+            for term in query_terms:
+                documents = self.postings[term]
+                idf = math.log(1 + (total - len(documents) + 0.5) / (len(documents) + 0.5))
+                for file_id in candidates:
+                    frequency = documents[file_id]
+                    norm = self.K1 * (1 - self.B + self.B * self.lengths[file_id] / average)
+                    scores[file_id] = scores.get(file_id, 0.0) + idf * frequency * (self.K1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+memory_index = InvertedIndex()
+
+
+# -------------------- BUSQUEDA --------------------
+def _postgres_search(session, query, visible, offset, limit):
+    vector = func.to_tsvector(literal_column(f"'{SEARCH_CONFIG}'"), MedicalFileSearch.document)
+    ts_query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), query)
+    rank = func.ts_rank(vector, ts_query).label("rank")
+    stmt = (select(MedicalFileSearch.medical_file_id, rank)
+            .join(MedicalFile, MedicalFile.id == MedicalFileSearch.medical_file_id)
+            .where(vector.op("@@")(ts_query)))
+    if visible is not None:
+        stmt = stmt.where(visible)
+    stmt = stmt.order_by(rank.desc(), MedicalFileSearch.medical_file_id).offset(offset).limit(limit + 1)
+    return [(file_id, float(score)) for file_id, score in session.execute(stmt)]
+
+
+def _memory_search(session, query, visible, offset, limit):
+    memory_index.sync(session)
+    ranked = memory_index.search(query)
+    if visible is not None and ranked:
+        allowed = set()
+        ids = [file_id for file_id, _ in ranked]
+        for start in range(0, len(ids), 500):
+            allowed.update(session.scalars(select(MedicalFile.id).where(
+                MedicalFile.id.in_(ids[start:start + 500]), visible)))
+        ranked = [item for item in ranked if item[0] in allowed]
+    return ranked[offset:offset + limit + 1]
+
+
+def search_medical_files(session, query, visible=None, offset=0, limit=50):
+    """
+    Devuelve ([(id de expediente, puntaje)], hay_mas) ordenados por relevancia.
+    `visible` es una condicion sobre MedicalFile para limitar los resultados.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        rows = _postgres_search(session, query, visible, offset, limit)
+    else:
+        rows = _memory_search(session, query, visible, offset, limit)
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,148 @@
+"""
+Generacion masiva de datos de prueba.
+Crea usuarios de todos los roles y, para cada paciente, un expediente completo
+con sus antecedentes. Todo se inserta por lotes con executemany y una sola
+contraseña hasheada, y es reproducible gracias a una semilla fija.
+"""
+import random
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import insert, func, select
+from api.passwords import hash_password
+from api.models import User, UserRole, UserStatus, SexType, FileStatus
+from api.ingest import insert_file_rows
+from api.schemas import SECTION_MODELS, MANAGED_COLUMNS
+
+SEED_CHUNK_SIZE = 5000
+
+# Proporcion de cada rol sobre el total de usuarios (el resto son pacientes)
+ROLE_SHARES = (
+    (UserRole.admin, 0.001),
+    (UserRole.profesional, 0.05),
+    (UserRole.estudiante, 0.15),
+)
+
+NAMES = ("María", "José", "Lucía", "Juan", "Sofía", "Carlos", "Valentina", "Luis",
+         "Camila", "Miguel", "Fernanda", "Jorge", "Daniela", "Pedro", "Ana", "Diego")
+SURNAMES = ("García", "Hernández", "López", "Martínez", "González", "Pérez", "Rodríguez",
+            "Sánchez", "Ramírez", "Cruz", "Flores", "Gómez", "Morales", "Vázquez", "Reyes")
+PROFESSIONS = ("Médico general", "Pediatra", "Ginecóloga", "Cardiólogo", "Psiquiatra")
+TEXT_ANSWERS = ("Ninguno", "Ninguna", "Niega", "Ocasional", "Frecuente", "No refiere",
+                "Paracetamol", "Penicilina", "Apendicectomía", "Fractura de radio")
+EDUCATION = ("Primaria", "Secundaria", "Preparatoria", "Licenciatura", "Posgrado")
+MARITAL = ("Soltero", "Casado", "Unión libre", "Divorciado", "Viudo")
+
+
+def _birth_day(rng, min_age, max_age):
+    return date.today() - timedelta(days=rng.randint(min_age * 365, max_age * 365))
+
+
+def _user_row(rng, role, number, password):
+    sex = rng.choice(list(SexType))
+    return {
+        "names": rng.choice(NAMES),
+        "first_surname": rng.choice(SURNAMES),
+        "second_surname": rng.choice(SURNAMES),
+        "birth_day": _birth_day(rng, 18, 90),
+        "profession": rng.choice(PROFESSIONS) if role == UserRole.profesional else None,
+        "sex": sex,
+        "phone": f"55{rng.randint(10000000, 99999999)}",
+        "email": f"{role.name}{number}@seed.test",
+        "password": password,
+        "role": role,
+        "status": UserStatus.aprobado,
+    }
+
+
+def _section_value(rng, column):
+    python_type = column.type.python_type
+    if python_type is bool:
+        return rng.random() < 0.2
+    if python_type is int:
+        return rng.randint(0, 4) if column.key != "menarche_age" else rng.randint(9, 16)
+    if python_type is date:
+        return _birth_day(rng, 0, 90)
+    if issubclass(python_type, SexType):
+        return rng.choice(list(SexType))
+    if column.key == "education_level":
+        return rng.choice(EDUCATION)
+    if column.key == "marital_status":
+        return rng.choice(MARITAL)
+    return rng.choice(TEXT_ANSWERS)
+
+
+def _file_rows(rng, patient, creator_id, supervisor_id, now):
+    file_row = {
+        "user_id": patient["id"],
+        "created_by": creator_id,
+        "created_at": now,
+        "supervised_by": supervisor_id,
+        "supervised_at": now,
+        "confirmed_at": now,
+        "status": rng.choice(list(FileStatus)),
+    }
+    section_rows = {}
+    for key, model in SECTION_MODELS.items():
+        if key == "gynecological" and patient["sex"] != SexType.femenino:
+            continue
+        row = {"user_id": patient["id"]}
+        for column in model.__table__.columns:
+            if column.key in MANAGED_COLUMNS:
+                continue
+            row[column.key] = _section_value(rng, column)
+        if key == "personal_data":
+            row.update(full_name=patient["names"], paternal_surname=patient["first_surname"],
+                       maternal_surname=patient["second_surname"], sex=patient["sex"],
+                       birth_date=patient["birth_day"], phone=patient["phone"])
+        section_rows[model] = row
+    return file_row, section_rows
+
+
+def _insert_users(session, rows):
+    stmt = insert(User).returning(User.id, sort_by_parameter_order=True)
+    return session.scalars(stmt, rows).all()
+
+
+def seed_database(session, total_users, seed=42, chunk_size=SEED_CHUNK_SIZE,
+                  password="123456", echo=print):
+    """
+    Inserta `total_users` usuarios (al menos uno por rol) y un expediente completo
+    por paciente. Devuelve un diccionario con el numero de filas creadas por rol.
+    """
+    rng = random.Random(seed)
+    password_hash = hash_password(password)
+    now = datetime.now(timezone.utc)
+    # Numeracion de correos a partir del ultimo id para poder ejecutarlo varias veces
+    offset = session.scalar(select(func.coalesce(func.max(User.id), 0)))
+
+    counts = {}
+    staff_ids = {}
+    remaining = total_users
+    for role, share in ROLE_SHARES:
+        count = max(1, int(total_users * share))
+        staff_ids[role] = []
+        for start in range(0, count, chunk_size):
+            rows = [_user_row(rng, role, offset + start + n, password_hash)
+                    for n in range(min(chunk_size, count - start))]
+            staff_ids[role].extend(_insert_users(session, rows))
+            session.commit()
+        counts[role.value] = count
+        remaining -= count
+        echo(f"{count} usuarios con rol {role.value} creados")
+
+    patients = max(remaining, 1)
+    for start in range(0, patients, chunk_size):
+        rows = [_user_row(rng, UserRole.paciente, offset + start + n, password_hash)
+                for n in range(min(chunk_size, patients - start))]
+        for row, user_id in zip(rows, _insert_users(session, rows)):
+            row["id"] = user_id
+        insert_file_rows(session, [
+            _file_rows(rng, row,
+                       rng.choice(staff_ids[UserRole.estudiante]),
+                       rng.choice(staff_ids[UserRole.profesional]), now)
+            for row in rows
+        ])
+        session.commit()
+        echo(f"{start + len(rows)}/{patients} pacientes con expediente creados")
+    counts[UserRole.paciente.value] = patients
+
+    return counts
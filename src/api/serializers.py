@@ -0,0 +1,91 @@
+"""
+Serializadores de columnas precompilados por modelo.
+Cada serializador se construye una sola vez al importar el modulo a partir de
+las columnas mapeadas del modelo y lee todos los valores con un unico
+attrgetter. Las fechas y enums los codifica el proveedor JSON (api/json_provider.py).
+"""
+import hashlib
+from operator import attrgetter
+from sqlalchemy import inspect
+from api.models import (
+    User,
+    MedicalFile,
+    PersonalData,
+    PathologicalBackground,
+    FamilyBackground,
+    GynecologicalBackground,
+    NonPathologicalBackground
+)
+
+
+class ColumnSerializer:
+    __slots__ = ("keys", "_getter")
+
+    def __init__(self, model, exclude=()):
+        self.keys = tuple(attr.key for attr in inspect(model).column_attrs
+                          if attr.key not in exclude)
+        getter = attrgetter(*self.keys)
+        # attrgetter con una sola clave no devuelve tupla
+        self._getter = getter if len(self.keys) > 1 else (lambda obj: (getter(obj),))
+
+    def values(self, obj):
+        # Tupla con los valores crudos de las columnas, en el orden de `keys`
+        return self._getter(obj)
+
+    def __call__(self, obj):
+        # Fechas y enums quedan tal cual: el proveedor JSON de la app los convierte
+        if obj is None:
+            return None
+        return dict(zip(self.keys, self._getter(obj)))
+
+
+SERIALIZERS = {
+    User: ColumnSerializer(User, exclude=("password",)),
+    MedicalFile: ColumnSerializer(MedicalFile),
+    PersonalData: ColumnSerializer(PersonalData),
+    PathologicalBackground: ColumnSerializer(PathologicalBackground),
+    FamilyBackground: ColumnSerializer(FamilyBackground),
+    GynecologicalBackground: ColumnSerializer(GynecologicalBackground),
+    NonPathologicalBackground: ColumnSerializer(NonPathologicalBackground),
+}
+
+# Relaciones incluidas en el detalle de un expediente
+MEDICAL_FILE_USERS = ("user", "creator", "supervisor")
+MEDICAL_FILE_SECTIONS = (
+    ("personal_data", PersonalData),
+    ("pathological_background", PathologicalBackground),
+    ("family_background", FamilyBackground),
+    ("gynecological_background", GynecologicalBackground),
+    ("non_pathological_background", NonPathologicalBackground),
+)
+
+
+def serialize(obj):
+    if obj is None:
+        return None
+    return SERIALIZERS[type(obj)](obj)
+
+
+def serialize_medical_file_detail(medical_file):
+    # Expediente completo: columnas, usuarios relacionados y los cinco antecedentes
+    data = SERIALIZERS[MedicalFile](medical_file)
+    for key in MEDICAL_FILE_USERS:
+        data[key] = serialize(getattr(medical_file, key))
+    for key, _ in MEDICAL_FILE_SECTIONS:
+        data[key] = serialize(getattr(medical_file, key))
+    return data
+
+
+def medical_file_etag(medical_file):
+    """
+    ETag del detalle de un expediente. Las filas versionadas (expediente y
+    antecedentes) aportan solo su id y su `version`; los usuarios relacionados
+    no tienen version y aportan sus valores crudos.
+    """
+    versions = [(medical_file.id, medical_file.version)]
+    for key, _ in MEDICAL_FILE_SECTIONS:
+        section = getattr(medical_file, key)
+        versions.append(None if section is None else (section.id, section.version))
+    users = [getattr(medical_file, key) for key in MEDICAL_FILE_USERS]
+    values = [None if user is None else SERIALIZERS[User].values(user) for user in users]
+    return hashlib.blake2b(repr((versions, values)).encode(), digest_size=16).hexdigest()
@@ -0,0 +1,186 @@
+"""
+Servidor de los archivos estaticos del frontend (SPA).
+Al iniciar se recorre el directorio una sola vez y se arma un manifiesto en
+memoria con tipo, tamaño, ETag y variantes precomprimidas (.br/.gz) de cada
+archivo, asi cada solicitud es una busqueda en un diccionario sin tocar el
+disco hasta enviar el contenido. En desarrollo (auto_reload) solo se revisa el
+mtime del archivo pedido y se vuelve a leer si cambio.
+- Los archivos con hash en el nombre (los de Vite en assets/) se cachean un
+  año como inmutables: si cambian, cambia su nombre.
+- index.html y el resto se revalidan siempre (no-cache) con ETag/304.
+- Las rutas desconocidas devuelven index.html para el enrutador del frontend.
+Las variantes comprimidas las genera `flask compress-assets` despues del build.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+INDEX_FILE = "index.html"
+IMMUTABLE_MAX_AGE = 31536000
+# Solo vale la pena comprimir texto y por encima de cierto tamaño
+COMPRESSIBLE_EXTENSIONS = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".ico", ".xml"}
+COMPRESS_MIN_SIZE = 1024
+# Orden de preferencia cuando el cliente acepta varias codificaciones
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Vite deja los archivos con hash en assets/ (nombre-<hash>.ext); fuera de esa
+# carpeta se reconoce un segmento de 8+ caracteres con al menos un digito
+HASHED_NAME = re.compile(r"[.-](?=[A-Za-z_-]*\d)[A-Za-z0-9_-]{8,}\.\w+$")
+
+
+def is_hashed(path):
+    return path.startswith("assets/") or HASHED_NAME.search(path) is not None
+
+
+def _signature(filename):
+    # (mtime, tamaño) del archivo y de sus variantes; None si no existe
+    signature = []
+    for name in (filename,) + tuple(filename + suffix for _, suffix in ENCODINGS):
+        try:
+            stat = os.stat(name)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class StaticAsset:
+    __slots__ = ("path", "filename", "mimetype", "size", "etag", "immutable", "variants", "signature")
+
+    def __init__(self, root, path):
+        self.path = path
+        self.filename = os.path.join(root, path)
+        self.signature = _signature(self.filename)
+        self.mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.size = os.path.getsize(self.filename)
+        with open(self.filename, "rb") as content:
+            self.etag = hashlib.blake2b(content.read(), digest_size=16).hexdigest()
+        self.immutable = path != INDEX_FILE and is_hashed(path)
+        # codificacion -> (archivo, tamaño)
+        self.variants = {}
+        for encoding, suffix in ENCODINGS:
+            variant = self.filename + suffix
+            if os.path.isfile(variant):
+                self.variants[encoding] = (variant, os.path.getsize(variant))
+
+
+class StaticManifest:
+    def __init__(self, root, auto_reload=False):
+        self.root = os.path.realpath(root)
+        # En desarrollo el build puede cambiar sin reiniciar el servidor
+        self.auto_reload = auto_reload
+        self.assets = {}
+        self.reload()
+
+    def reload(self):
+        assets = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith((".gz", ".br")):
+                    continue
+                path = os.path.relpath(os.path.join(directory, name), self.root).replace(os.sep, "/")
+                assets[path] = StaticAsset(self.root, path)
+        self.assets = assets
+
+    def get(self, path):
+        # Fuera del manifiesto no se sirve nada: evita recorrer rutas como ../
+        if self.auto_reload:
+            return self._refresh(path)
+        return self.assets.get(path)
+
+    def _refresh(self, path):
+        # En desarrollo solo se revisa el archivo pedido: se vuelve a leer si
+        # cambio su mtime o tamaño (o el de sus variantes), sin recorrer el directorio
+        asset = self.assets.get(path)
+        if asset is None:
+            filename = os.path.normpath(os.path.join(self.root, path))
+            if (not filename.startswith(self.root + os.sep) or filename.endswith((".gz", ".br"))
+                    or not os.path.isfile(filename)):
+                return None
+            path = os.path.relpath(filename, self.root).replace(os.sep, "/")
+        elif asset.signature == _signature(asset.filename):
+            return asset
+        elif not os.path.isfile(asset.filename):
+            del self.assets[path]
+            return None
+        asset = self.assets[path] = StaticAsset(self.root, path)
+        return asset
+
+    def index(self):
+        return self.get(INDEX_FILE)
+
+
+def _negotiate(asset):
+    accepted = request.accept_encodings
+    for encoding, _ in ENCODINGS:
+        if encoding in asset.variants and accepted[encoding]:
+            return encoding
+    return None
+
+
+def serve_asset(asset):
+    """Respuesta para un archivo del manifiesto con cache, ETag y compresion."""
+    encoding = _negotiate(asset)
+    etag = asset.etag if encoding is None else f"{asset.etag}-{encoding}"
+
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        filename, size = asset.variants[encoding] if encoding else (asset.filename, asset.size)
+        response = Response(wrap_file(request.environ, open(filename, "rb")),
+                            mimetype=asset.mimetype, direct_passthrough=True)
+        response.content_length = size
+        if encoding:
+            response.content_encoding = encoding
+    response.set_etag(etag)
+    if asset.variants:
+        response.vary.add("Accept-Encoding")
+
+    if asset.immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def compress_assets(root, min_size=COMPRESS_MIN_SIZE):
+    """Escribe las variantes .gz (y .br si esta instalado brotli) de los archivos de texto."""
+    written = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            filename = os.path.join(directory, name)
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            if os.path.getsize(filename) < min_size:
+                continue
+            with open(filename, "rb") as source:
+                content = source.read()
+            compressed = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                compressed.append((".br", brotli.compress(content, quality=11)))
+            for suffix, data in compressed:
+                # Una variante mas grande que el original no sirve de nada
+                if len(data) < len(content):
+                    with open(filename + suffix, "wb") as output:
+                        output.write(data)
+                    written.append((filename + suffix, len(content), len(data)))
+    return written
+
+
+def serve_static(manifest, path):
+    # Las rutas que no son archivos son del enrutador del frontend: index.html
+    asset = manifest.get(path) or manifest.index()
+    if asset is None:
+        return Response("Not Found", status=404)
+    return serve_asset(asset)
@@ -0,0 +1,221 @@
+"""
+Estadisticas de cohorte sobre los ocho factores hereditarios de FamilyBackground.
+Cada expediente con antecedentes familiares se reduce a un perfil:
+(sexo, grupo de edad al crear el expediente, estado, mapa de bits de factores).
+`family_risk_stats` cuenta cuantos expedientes hay por perfil, asi que una
+cohorte tiene a lo sumo 256 filas (una por combinacion de factores) y de ellas
+salen en memoria la prevalencia de cada factor y la co-ocurrencia de cada par.
+
+Los conteos se mantienen de forma incremental en la misma transaccion que el
+cambio: se resta el perfil anterior del expediente (family_risk_profiles) y se
+suma el nuevo. `flask rebuild-family-stats` los recalcula desde cero.
+"""
+from collections import Counter
+from datetime import date, datetime
+from sqlalchemy import select, delete, insert, update, func, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from api.models import (
+    MedicalFile,
+    PersonalData,
+    FamilyBackground,
+    FamilyRiskProfile,
+    FamilyRiskStat
+)
+
+# Factores hereditarios; su posicion es el bit en el mapa de bits
+FLAGS = ("hypertension", "diabetes", "cancer", "heart_disease", "kidney_disease",
+         "liver_disease", "mental_illness", "congenital_malformations")
+FLAG_COLUMNS = [getattr(FamilyBackground, name) for name in FLAGS]
+
+# (edad minima, etiqueta) en orden ascendente
+AGE_BANDS = ((0, "0-17"), (18, "18-29"), (30, "30-44"), (45, "45-59"), (60, "60-74"), (75, "75+"))
+UNKNOWN = "sin_dato"
+DIMENSIONS = ("sex", "age_band", "status")
+# Modelos cuyos cambios pueden mover un expediente de celda
+PROFILE_MODELS = (MedicalFile, PersonalData, FamilyBackground)
+
+
+def flag_mask(values):
+    mask = 0
+    for bit, value in enumerate(values):
+        if value:
+            mask |= 1 << bit
+    return mask
+
+
+def age_band(birth_date, at):
+    if birth_date is None:
+        return UNKNOWN
+    at = at.date() if isinstance(at, datetime) else at or date.today()
+    age = at.year - birth_date.year - ((at.month, at.day) < (birth_date.month, birth_date.day))
+    label = AGE_BANDS[0][1]
+    for minimum, name in AGE_BANDS:
+        if age >= minimum:
+            label = name
+    return label
+
+
+def _value(enum_value):
+    return enum_value.value if enum_value is not None else UNKNOWN
+
+
+def profile_rows(session, medical_file_ids):
+    # Perfil actual de cada expediente con antecedentes familiares: {id: (sexo, edad, estado, bits)}
+    stmt = (select(MedicalFile.id, MedicalFile.status, MedicalFile.created_at,
+                   PersonalData.sex, PersonalData.birth_date, *FLAG_COLUMNS)
+            .join(FamilyBackground, FamilyBackground.medical_file_id == MedicalFile.id)
+            .outerjoin(PersonalData, PersonalData.medical_file_id == MedicalFile.id))
+    if medical_file_ids is not None:
+        stmt = stmt.where(MedicalFile.id.in_(medical_file_ids))
+    profiles = {}
+    for file_id, status, created_at, sex, birth_date, *flags in session.execute(stmt):
+        profiles[file_id] = (_value(sex), age_band(birth_date, created_at), _value(status), flag_mask(flags))
+    return profiles
+
+
+def _apply_deltas(session, deltas):
+    # Suma los cambios a los conteos; PostgreSQL y SQLite en un solo upsert por lote
+    rows = [dict(zip(DIMENSIONS + ("flags",), key), total=delta)
+            for key, delta in deltas.items() if delta]
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        stmt = (postgresql if dialect == "postgresql" else sqlite).insert(FamilyRiskStat)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(DIMENSIONS) + ["flags"],
+            set_={"total": FamilyRiskStat.total + stmt.excluded.total})
+        session.execute(stmt, rows)
+    else:
+        for row in rows:
+            key = [getattr(FamilyRiskStat, name) == row[name] for name in DIMENSIONS + ("flags",)]
+            result = session.execute(update(FamilyRiskStat).where(*key)
+                                     .values(total=FamilyRiskStat.total + row["total"]))
+            if result.rowcount == 0:
+                session.execute(insert(FamilyRiskStat), [row])
+    if any(row["total"] < 0 for row in rows):
+        session.execute(delete(FamilyRiskStat).where(FamilyRiskStat.total <= 0))
+
+
+def refresh_profiles(session, medical_file_ids):
+    """Mueve cada expediente de su celda anterior a la actual (o lo quita si ya no existe)."""
+    ids = sorted(set(medical_file_ids))
+    if not ids:
+        return
+    old = {row.medical_file_id: (row.sex, row.age_band, row.status, row.flags)
+           for row in session.execute(select(FamilyRiskProfile)
+                                      .where(FamilyRiskProfile.medical_file_id.in_(ids))).scalars()}
+    new = profile_rows(session, ids)
+    changed = [file_id for file_id in ids if old.get(file_id) != new.get(file_id)]
+    if not changed:
+        return
+
+    deltas = Counter()
+    for file_id in changed:
+        if file_id in old:
+            deltas[old[file_id]] -= 1
+        if file_id in new:
+            deltas[new[file_id]] += 1
+    session.execute(delete(FamilyRiskProfile).where(FamilyRiskProfile.medical_file_id.in_(changed)))
+    rows = [dict(zip(("medical_file_id",) + DIMENSIONS + ("flags",), (file_id,) + new[file_id]))
+            for file_id in changed if file_id in new]
+    if rows:
+        session.execute(insert(FamilyRiskProfile), rows)
+    _apply_deltas(session, deltas)
+
+
+def rebuild_family_stats(session, batch_size=5000):
+    """Recalcula perfiles y conteos de todos los expedientes en una transaccion."""
+    session.execute(delete(FamilyRiskProfile))
+    session.execute(delete(FamilyRiskStat))
+    counts = Counter()
+    last_id = 0
+    while True:
+        ids = session.scalars(select(MedicalFile.id).where(MedicalFile.id > last_id)
+                              .order_by(MedicalFile.id).limit(batch_size)).all()
+        if not ids:
+            break
+        profiles = profile_rows(session, ids)
+        if profiles:
+            session.execute(insert(FamilyRiskProfile), [
+                dict(zip(("medical_file_id",) + DIMENSIONS + ("flags",), (file_id,) + profile))
+                for file_id, profile in profiles.items()])
+            counts.update(profiles.values())
+        last_id = ids[-1]
+    _apply_deltas(session, counts)
+    session.commit()
+    return sum(counts.values()), len(counts)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_profiles(session, flush_context):
+    changed = session.info.setdefault("stats_changed", set())
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, MedicalFile):
+            changed.add(obj.id)
+        elif isinstance(obj, PROFILE_MODELS) and obj.medical_file_id is not None:
+            changed.add(obj.medical_file_id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _update_profiles(session, flush_context):
+    refresh_profiles(session, session.info.pop("stats_changed", set()))
+
+
+# -------------------- CONSULTAS --------------------
+def summarize(mask_counts, co_occurrence=True):
+    """Total, prevalencia por factor y co-ocurrencia por par a partir de {bits: expedientes}."""
+    total = sum(mask_counts.values())
+    flag_counts = [0] * len(FLAGS)
+    pairs = [[0] * len(FLAGS) for _ in FLAGS]
+    for mask, count in mask_counts.items():
+        bits = [bit for bit in range(len(FLAGS)) if mask >> bit & 1]
+        for index, bit in enumerate(bits):
+            flag_counts[bit] += count
+            for other in bits[index + 1:]:
+                pairs[bit][other] += count
+                pairs[other][bit] += count
+    summary = {
+        "total": total,
+        "prevalence": {
+            name: {"count": flag_counts[bit], "rate": round(flag_counts[bit] / total, 4) if total else 0.0}
+            for bit, name in enumerate(FLAGS)
+        },
+    }
+    if co_occurrence:
+        summary["co_occurrence"] = {
+            name: {other: pairs[bit][other_bit]
+                   for other_bit, other in enumerate(FLAGS) if other_bit != bit}
+            for bit, name in enumerate(FLAGS)
+        }
+    return summary
+
+
+def cohort_stats(session, filters=None, group_by=None):
+    """
+    Prevalencia y co-ocurrencia de la cohorte que cumple `filters`
+    ({"sex": ..., "age_band": ..., "status": ...}); con `group_by` (una dimension)
+    ademas se devuelve el resumen de cada grupo.
+    """
+    columns = [FamilyRiskStat.flags]
+    if group_by:
+        columns.insert(0, getattr(FamilyRiskStat, group_by))
+    stmt = select(*columns, func.sum(FamilyRiskStat.total)).group_by(*columns)
+    for name, value in (filters or {}).items():
+        if value is not None:
+            stmt = stmt.where(getattr(FamilyRiskStat, name) == value)
+
+    overall = Counter()
+    groups = {}
+    for row in session.execute(stmt):
+        *group, mask, count = row
+        overall[mask] += count
+        if group_by:
+            groups.setdefault(group[0], Counter())[mask] += count
+
+    result = summarize(overall)
+    if group_by:
+        result["groups"] = [dict(summarize(counts, co_occurrence=False), **{group_by: value})
+                            for value, counts in sorted(groups.items())]
+    return result
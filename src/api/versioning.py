@@ -0,0 +1,31 @@
+"""
+Concurrencia optimista para expedientes y antecedentes.
+Cada tabla tiene una columna `version` (version_id_col de SQLAlchemy): el UPDATE
+incluye `WHERE version = <leida>` y falla si otra solicitud la cambio antes.
+Los endpoints de actualizacion aceptan If-Match con el ETag del expediente y
+responden 409 con el ETag vigente cuando no coincide, sin bloquear filas.
+"""
+from flask import request
+from sqlalchemy.orm.exc import StaleDataError
+from api.models import db
+from api.utils import APIException
+
+CONFLICT_MESSAGE = "El expediente fue modificado por otro usuario; vuelve a cargarlo"
+
+
+def check_if_match(current_etag):
+    # Sin If-Match la actualizacion procede; la columna version protege la escritura
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return
+    if not if_match.contains_weak(current_etag):
+        raise APIException(CONFLICT_MESSAGE, status_code=409, payload={"etag": current_etag})
+
+
+def flush_or_conflict():
+    # Envia los UPDATE condicionados por version; 409 si alguna fila cambio entre tanto
+    try:
+        db.session.flush()
+    except StaleDataError:
+        db.session.rollback()
+        raise APIException(CONFLICT_MESSAGE, status_code=409)
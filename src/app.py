@@ -2,27 +2,34 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, send_from_directory
+from flask import Flask, request, jsonify, url_for
 from flask_migrate import Migrate
 from flask_swagger import swagger
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 from api.utils import APIException, generate_sitemap
 from api.models import db
+from api.database import engine_options, setup_replicas
 from api.routes import api
 from api.admin import setup_admin
 from api.commands import setup_commands
+from api.metrics import setup_metrics
+from api.compression import setup_compression
+from api.static_assets import StaticManifest, serve_static
+from api.json_provider import JSONProvider
 
 # Cargar variables del archivo .env
 load_dotenv()
 
 # Configurar entorno
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
-static_file_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../public/')
+static_file_dir = os.getenv("STATIC_FILE_DIR") or os.path.join(os.path.dirname(os.path.realpath(__file__)), '../public/')
 
 # Crear la app Flask
 app = Flask(__name__)
 app.url_map.strict_slashes = False
+# JSON con orjson (si está instalado): fechas ISO 8601 y enums por su valor
+app.json = JSONProvider(app)
 
 
 
@@ -34,6 +41,8 @@ else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Tamaño, overflow, timeout, recycle y pre-ping del pool desde variables de entorno
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 # Clave secreta JWT
 app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
@@ -41,11 +50,16 @@ app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
 # Inicializar extensiones
 MIGRATE = Migrate(app, db, compare_type=True)
 db.init_app(app)
+# Réplicas de lectura opcionales (DATABASE_REPLICA_URLS)
+setup_replicas(app)
 jwt = JWTManager(app)
 
 # Agregar admin y comandos
 setup_admin(app)
 setup_commands(app)
+setup_metrics(app)
+# Después de las métricas para que estas registren el tamaño ya comprimido
+setup_compression(app)
 
 # Registrar blueprint de la API
 app.register_blueprint(api, url_prefix='/api')
@@ -53,23 +67,24 @@ app.register_blueprint(api, url_prefix='/api')
 # Manejo de errores
 @app.errorhandler(APIException)
 def handle_invalid_usage(error):
-    return jsonify(error.to_dict()), error.status_code
+    return jsonify(error.to_dict()), error.status_code, error.headers or {}
+
+# Manifiesto en memoria de los archivos del frontend (se recorre el disco una vez)
+static_assets = StaticManifest(static_file_dir, auto_reload=ENV == "development")
+app.extensions["static_assets"] = static_assets
 
 # Generar sitemap (solo en desarrollo)
 @app.route('/')
 def sitemap():
     if ENV == "development":
         return generate_sitemap(app)
-    return send_from_directory(static_file_dir, 'index.html')
+    return serve_static(static_assets, 'index.html')
 
-# Servir archivos estáticos (React)
+# Servir archivos estáticos (React): los que tienen hash se cachean un año,
+# index.html se revalida siempre
 @app.route('/<path:path>', methods=['GET'])
 def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0
-    return response
+    return serve_static(static_assets, path)
 
 # Ejecutar el servidor
 if __name__ == '__main__':
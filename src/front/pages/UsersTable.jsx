@@ -2,26 +2,31 @@ import React, { useEffect, useState } from 'react';
 
 const UsersTable = () => {
     const [users, setUsers] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const backendUrl = import.meta.env.VITE_BACKEND_URL;
 
-    useEffect(() => {
-        const fetchUsers = async () => {
-            try {
-                const response = await fetch(`${backendUrl}/api/users`, {
-                    method: 'GET',
-                    headers: {
-                        "Authorization": `Bearer ${localStorage.getItem('token')}`
-                    }
-                });
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
+    // La API devuelve los usuarios por páginas; nextCursor pide la siguiente
+    const fetchUsers = async (cursor = null) => {
+        try {
+            const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+            const response = await fetch(`${backendUrl}/api/users${query}`, {
+                method: 'GET',
+                headers: {
+                    "Authorization": `Bearer ${localStorage.getItem('token')}`
                 }
-                const data = await response.json();
-                setUsers(data);
-            } catch (error) {
-                console.error('Error fetching users:', error);
+            });
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
             }
-        };
+            const data = await response.json();
+            setUsers(previous => cursor ? [...previous, ...data.users] : data.users);
+            setNextCursor(data.next_cursor);
+        } catch (error) {
+            console.error('Error fetching users:', error);
+        }
+    };
+
+    useEffect(() => {
         fetchUsers();
     }, []);
 
@@ -49,6 +54,7 @@ const UsersTable = () => {
     };
 
     return (
+        <>
         <table className="table table-hover">
             <thead>
                 <tr>
@@ -78,6 +84,12 @@ const UsersTable = () => {
                 ))}
             </tbody>
         </table>
+        {nextCursor && (
+            <button className="btn btn-secondary" onClick={() => fetchUsers(nextCursor)}>
+                Cargar más
+            </button>
+        )}
+        </>
     );
 };
 
@@ -0,0 +1,116 @@
+"""
+Configuracion comun de las pruebas: base SQLite temporal y ayudas para crear
+usuarios, emitir tokens y contar las sentencias SQL de una solicitud.
+Los datos se crean en contextos de aplicacion cortos; las solicitudes del
+cliente de prueba abren el suyo, asi que cada una usa una sesion nueva.
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+# La app lee la configuracion al importarse
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'tests.db')}"
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-with-at-least-32-bytes")
+os.environ["CACHE_ENABLED"] = "false"
+os.environ.pop("DATABASE_REPLICA_URLS", None)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import app as flask_app  # noqa: E402
+from api.auth import token_claims, user_cache  # noqa: E402
+from api.models import db, User, UserRole, UserStatus  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    # Tablas nuevas para cada prueba
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    user_cache.clear()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    # Crea un usuario aprobado y devuelve su id
+    def make(email, role=UserRole.paciente):
+        with app.app_context():
+            user = User(names=email.split("@")[0], first_surname="Prueba",
+                        birth_day=date(1990, 1, 1), email=email, password="x",
+                        role=role, status=UserStatus.aprobado)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def auth_headers(app):
+    # Cabecera Authorization con un access token con los claims de rol y estado
+    def headers(user_id):
+        with app.app_context():
+            claims = token_claims(db.session.get(User, user_id))
+            token = create_access_token(identity=str(user_id), additional_claims=claims)
+        return {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+@pytest.fixture
+def count_statements(app):
+    # Ejecuta `request()` y devuelve (respuesta, sentencias SQL emitidas)
+    def count(request):
+        with app.app_context():
+            engine = db.engine
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            response = request()
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        return response, statements
+    return count
+
+
+@pytest.fixture
+def medical_file_payload():
+    # Payload valido de POST /api/medical-file (sin seccion ginecologica)
+    text = "Ninguno"
+
+    def payload(patient_id, creator_id, supervisor_id, sex="masculino"):
+        return {
+            "user_id": patient_id, "created_by": creator_id, "supervised_by": supervisor_id,
+            "personal_data": {"full_name": "Paciente", "paternal_surname": "Prueba", "sex": sex,
+                              "birth_date": "1990-01-01", "address": "Calle 1", "phone": "5550000"},
+            "pathological": {key: text for key in (
+                "personal_diseases", "medications", "hospitalizations", "surgeries",
+                "traumatisms", "transfusions", "allergies", "others")},
+            "family": {"hypertension": False, "diabetes": True, "cancer": False,
+                       "heart_disease": False, "kidney_disease": False, "liver_disease": False,
+                       "mental_illness": False, "congenital_malformations": False, "others": text},
+            "non_pathological": {
+                "education_level": text, "economic_activity": text, "marital_status": text,
+                "dependents": "0", "occupation": text, "recent_travels": text,
+                "social_activities": text, "exercise": text, "diet_supplements": text,
+                "hygiene": text, "tattoos": False, "piercings": False, "hobbies": text,
+                "tobacco_use": "no", "alcohol_use": "no", "recreational_drugs": "no",
+                "addictions": text, "otherS": text},
+        }
+    return payload
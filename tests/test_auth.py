@@ -0,0 +1,50 @@
+"""
+El usuario del token solo se consulta en las vistas que lo usan; las que solo
+necesitan el rol (claim del token) no tocan la tabla users.
+"""
+from api.auth import user_cache
+from api.models import db, User, UserRole
+
+
+def _user_selects(statements):
+    return [statement for statement in statements if "FROM users" in statement
+            and "users.email" in statement and "WHERE users.id = ?" in statement]
+
+
+def test_role_only_endpoints_do_not_load_the_user(client, make_user, auth_headers, count_statements):
+    admin_id = make_user("admin@test.com", UserRole.admin)
+    headers = auth_headers(admin_id)
+
+    for _ in ("fria", "caliente"):
+        response, statements = count_statements(lambda: client.get("/api/users", headers=headers))
+        assert response.status_code == 200
+        # Solo el listado paginado de usuarios
+        assert len(statements) == 1, statements
+        assert not _user_selects(statements)
+
+
+def test_current_user_is_loaded_once_and_cached(client, make_user, auth_headers, count_statements):
+    user_id = make_user("pac@test.com")
+    headers = auth_headers(user_id)
+    user_cache.clear()
+
+    response, cold = count_statements(lambda: client.get("/api/private", headers=headers))
+    assert response.status_code == 200
+    assert response.get_json()["user"]["id"] == user_id
+    assert len(cold) == 1, cold
+
+    response, warm = count_statements(lambda: client.get("/api/private", headers=headers))
+    assert response.status_code == 200
+    assert warm == []
+
+
+def test_deleted_user_is_not_found_where_it_is_used(app, client, make_user, auth_headers):
+    user_id = make_user("pac@test.com")
+    headers = auth_headers(user_id)
+    with app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+    response = client.get("/api/private", headers=headers)
+    assert response.status_code == 404
+    assert response.get_json()["message"] == "Usuario no encontrado"
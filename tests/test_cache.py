@@ -0,0 +1,74 @@
+"""
+Cache de respuestas con invalidacion por etiquetas: la segunda solicitud se
+sirve del cache y un commit que toca la tabla etiquetada la invalida.
+"""
+import pytest
+from sqlalchemy import update
+from api import cache
+from api.cache import MemoryBackend
+from api.models import db, User, UserRole
+
+
+@pytest.fixture(autouse=True)
+def cache_backend(monkeypatch):
+    backend = MemoryBackend()
+    monkeypatch.setattr(cache, "backend", backend)
+    return backend
+
+
+@pytest.fixture
+def admin(make_user, auth_headers):
+    admin_id = make_user("admin@test.com", UserRole.admin)
+    return admin_id, auth_headers(admin_id)
+
+
+def _names(client, headers, expected_cache):
+    response = client.get("/api/users", headers=headers)
+    assert response.status_code == 200, response.get_json()
+    assert response.headers["X-Cache"] == expected_cache
+    return {user["id"]: user["names"] for user in response.get_json()["users"]}
+
+
+def test_hit_then_invalidated_by_orm_commit(app, client, admin):
+    admin_id, headers = admin
+    assert _names(client, headers, "MISS") == {admin_id: "admin"}
+    assert _names(client, headers, "HIT") == {admin_id: "admin"}
+
+    with app.app_context():
+        db.session.get(User, admin_id).names = "Ana"
+        db.session.commit()
+    assert _names(client, headers, "MISS") == {admin_id: "Ana"}
+    assert _names(client, headers, "HIT") == {admin_id: "Ana"}
+
+
+def test_invalidated_by_core_update(app, client, admin):
+    admin_id, headers = admin
+    _names(client, headers, "MISS")
+    with app.app_context():
+        db.session.execute(update(User).values(names="Core"))
+        db.session.commit()
+    assert _names(client, headers, "MISS") == {admin_id: "Core"}
+
+
+def test_rollback_and_other_tables_keep_entry(app, client, admin, make_user):
+    admin_id, headers = admin
+    _names(client, headers, "MISS")
+    with app.app_context():
+        db.session.get(User, admin_id).names = "Descartado"
+        db.session.flush()
+        db.session.rollback()
+    assert _names(client, headers, "HIT") == {admin_id: "admin"}
+
+    # Un usuario nuevo toca la tabla users: la entrada deja de servirse
+    patient_id = make_user("pac@test.com")
+    assert patient_id in _names(client, headers, "MISS")
+
+
+def test_entries_are_per_user(client, admin, make_user, auth_headers):
+    _, headers = admin
+    other = auth_headers(make_user("admin2@test.com", UserRole.admin))
+    _names(client, headers, "MISS")
+    _names(client, headers, "HIT")
+    # Otro usuario no recibe la entrada del primero
+    _names(client, other, "MISS")
+    _names(client, other, "HIT")
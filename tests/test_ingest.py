@@ -0,0 +1,34 @@
+"""
+POST /api/medical-files/bulk: cada elemento se valida con el mismo esquema que
+POST /api/medical-file y los errores de base de datos no exponen el mensaje
+del driver (puede incluir datos del paciente).
+"""
+from api.models import UserRole
+
+
+def test_bulk_reports_errors_per_item(client, make_user, auth_headers, medical_file_payload):
+    admin_id = make_user("admin@test.com", UserRole.admin)
+    professional_id = make_user("pro@test.com", UserRole.profesional)
+    patients = [make_user(f"pac{i}@test.com") for i in range(3)]
+
+    invalid = medical_file_payload(patients[1], professional_id, professional_id)
+    invalid["family"]["hypertension"] = "yes"
+    unknown = medical_file_payload(patients[2], professional_id, professional_id)
+    unknown["family"]["desconocido"] = 1
+    # El mismo paciente dos veces viola la unicidad de personal_data.user_id
+    items = [medical_file_payload(patients[0], professional_id, professional_id), invalid, unknown,
+             medical_file_payload(patients[0], professional_id, professional_id), None]
+
+    response = client.post("/api/medical-files/bulk", json=items, headers=auth_headers(admin_id))
+    assert response.status_code == 207
+    body = response.get_json()
+    results = body["results"]
+    assert body["created"] == 1 and body["failed"] == 4
+    assert "medical_file_id" in results[0]
+    assert results[1]["errors"] == {"family": {"hypertension": "Debe ser verdadero o falso"}}
+    assert results[2]["errors"] == {"family": {"desconocido": "Campo desconocido"}}
+    assert results[3]["error"] == "El expediente entra en conflicto con datos existentes"
+    assert results[4]["errors"] == {"_schema": "Debe ser un objeto JSON"}
+    # Nada del mensaje del driver llega al cliente
+    assert "personal_data" not in response.get_data(as_text=True)
+    assert "UNIQUE" not in response.get_data(as_text=True)
@@ -0,0 +1,43 @@
+"""
+Los dos proveedores JSON (orjson y biblioteca estandar) codifican los mismos
+tipos que el proveedor por defecto de Flask, con fechas en ISO 8601.
+"""
+import dataclasses
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from api import json_provider
+from api.json_provider import StdlibJSONProvider, OrjsonProvider
+from api.models import UserRole
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    when: date
+
+
+IDENTIFIER = uuid.UUID("12345678-1234-5678-1234-567812345678")
+VALUE = {"amount": Decimal("12.50"), "id": IDENTIFIER, "point": Point(1, date(2025, 1, 2)),
+         "role": UserRole.admin, "at": datetime(2025, 1, 2, 3, 4, 5)}
+EXPECTED = {"amount": "12.50", "id": str(IDENTIFIER), "point": {"x": 1, "when": "2025-01-02"},
+            "role": UserRole.admin.value, "at": "2025-01-02T03:04:05"}
+
+
+@pytest.mark.parametrize("provider_class", [StdlibJSONProvider, OrjsonProvider])
+def test_provider_encodes_flask_default_types(app, provider_class):
+    if provider_class is OrjsonProvider and json_provider.orjson is None:
+        pytest.skip("orjson no esta instalado")
+    provider = provider_class(app)
+    assert json.loads(provider.dumps_bytes(VALUE)) == EXPECTED
+    with app.test_request_context():
+        response = provider.response(VALUE)
+    assert json.loads(response.get_data()) == EXPECTED
+
+
+def test_dumps_bytes_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_provider, "orjson", None)
+    assert json.loads(json_provider.dumps_bytes(VALUE)) == EXPECTED
@@ -0,0 +1,71 @@
+"""
+GET /api/medical_files debe emitir un numero fijo de sentencias SQL por rol,
+sin importar cuantos expedientes devuelva (regresion de las consultas N+1).
+"""
+from datetime import datetime
+
+import pytest
+from api.auth import user_cache
+from api.models import db, MedicalFile, UserRole
+
+# Sentencias por solicitud: la vista solo usa los claims del token (no carga el
+# usuario), asi que una sola consulta de expedientes, sin importar cuantos haya
+# ni el estado de la cache de usuarios
+COLD_CACHE_STATEMENTS = 1
+WARM_CACHE_STATEMENTS = 1
+
+
+@pytest.fixture
+def users(make_user):
+    return {
+        UserRole.admin: make_user("admin@test.com", UserRole.admin),
+        UserRole.profesional: make_user("pro@test.com", UserRole.profesional),
+        UserRole.estudiante: make_user("est@test.com", UserRole.estudiante),
+        "patients": [make_user(f"pac{i}@test.com") for i in range(6)],
+    }
+
+
+def _add_files(app, professional_id, student_id, patient_ids):
+    # Alternando: creado por el estudiante o por el profesional, siempre
+    # supervisado por el profesional
+    now = datetime(2025, 1, 1)
+    with app.app_context():
+        for index, patient_id in enumerate(patient_ids):
+            creator = student_id if index % 2 == 0 else professional_id
+            db.session.add(MedicalFile(user_id=patient_id, created_by=creator, created_at=now,
+                                       supervised_by=professional_id, supervised_at=now,
+                                       confirmed_at=now))
+        db.session.commit()
+
+
+@pytest.mark.parametrize("role", [UserRole.admin, UserRole.profesional,
+                                  UserRole.estudiante, UserRole.paciente])
+def test_medical_files_statement_count_is_fixed(app, client, users, auth_headers,
+                                                count_statements, role):
+    professional_id, student_id = users[UserRole.profesional], users[UserRole.estudiante]
+    user_id = users["patients"][0] if role == UserRole.paciente else users[role]
+    headers = auth_headers(user_id)
+
+    def get_files():
+        response = client.get("/api/medical_files", headers=headers)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+
+    _add_files(app, professional_id, student_id, users["patients"][:2])
+    user_cache.clear()
+    small, cold = count_statements(get_files)
+    _, warm = count_statements(get_files)
+    _add_files(app, professional_id, student_id, users["patients"][2:])
+    user_cache.clear()
+    large, large_cold = count_statements(get_files)
+
+    assert len(cold) == COLD_CACHE_STATEMENTS, cold
+    assert len(warm) == WARM_CACHE_STATEMENTS, warm
+    assert len(large_cold) == COLD_CACHE_STATEMENTS, large_cold
+    if role == UserRole.profesional:
+        assert len(large["supervised_files"]) > len(small["supervised_files"]) >= 2
+        assert len(large["created_files"]) > len(small["created_files"]) >= 1
+    if role == UserRole.estudiante:
+        assert len(large["created_files"]) > len(small["created_files"]) >= 1
+    if role == UserRole.admin:
+        assert len(large["all_files"]) > len(small["all_files"])
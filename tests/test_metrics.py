@@ -0,0 +1,35 @@
+"""
+Contadores de SQL por solicitud: una sentencia que falla se cuenta una vez y no
+deja estado en la conexion que desempareje los tiempos de las siguientes.
+"""
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+import api.metrics as metrics
+from api.models import db
+
+
+class FakeClock:
+    def __init__(self, *times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0)
+
+
+def test_failed_statement_does_not_leak_its_start_time(app, monkeypatch):
+    with app.test_request_context("/api/users"):
+        g.metrics_start, g.sql_queries, g.sql_seconds, g.sql_statements = 0.0, 0, 0.0, []
+        with db.engine.connect() as connection:
+            # Falla: inicio 0, error 2; despues una correcta: inicio 10, fin 11
+            monkeypatch.setattr(metrics.time, "perf_counter", FakeClock(0.0, 2.0, 10.0, 11.0))
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM tabla_que_no_existe"))
+            connection.execute(text("SELECT 1"))
+            monkeypatch.undo()
+            assert not any(key for key in connection.info if "start" in key)
+
+        assert g.sql_queries == 2
+        assert g.sql_seconds == pytest.approx(3.0)
+
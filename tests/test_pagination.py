@@ -0,0 +1,89 @@
+"""
+Paginacion por cursor (keyset) de GET /api/users: las paginas encadenadas por
+next_cursor cubren todas las filas sin repetir y un cursor mal formado o con
+valores de otro tipo que la columna es un 400, no un error de base de datos.
+"""
+import pytest
+from sqlalchemy import select
+from api.models import db, User, UserRole, UserStatus
+from api.pagination import encode_cursor, keyset_page
+from api.utils import APIException
+
+
+@pytest.fixture
+def admin_headers(make_user, auth_headers):
+    return auth_headers(make_user("admin@test.com", UserRole.admin))
+
+
+def _all_pages(client, headers, **args):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(args, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/api/users", query_string=query, headers=headers)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        ids.extend(user["id"] for user in body["users"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_round_trip(client, make_user, admin_headers):
+    user_ids = [make_user(f"user{i}@test.com") for i in range(7)]
+    ids, pages = _all_pages(client, admin_headers, limit=3)
+    assert pages == 3
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert set(user_ids) < set(ids)
+
+
+def test_filters_apply_to_every_page(app, client, make_user, admin_headers):
+    students = [make_user(f"est{i}@test.com", UserRole.estudiante) for i in range(4)]
+    make_user("pro@test.com", UserRole.profesional)
+    with app.app_context():
+        db.session.get(User, students[0]).status = UserStatus.inactivo
+        db.session.commit()
+
+    ids, _ = _all_pages(client, admin_headers, limit=1, role="estudiante")
+    assert ids == students
+    ids, _ = _all_pages(client, admin_headers, limit=2, role="estudiante", status="aprobado")
+    assert ids == students[1:]
+    # El filtro acepta el valor del enum o su nombre
+    assert _all_pages(client, admin_headers, role="administrador")[0] == \
+        _all_pages(client, admin_headers, role="admin")[0]
+
+    response = client.get("/api/users?role=desconocido", headers=admin_headers)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    encode_cursor({"id": 1}),
+    encode_cursor([1, 2]),
+    encode_cursor(["abc"]),
+    encode_cursor([True]),
+    encode_cursor([1.5]),
+])
+def test_invalid_cursor_is_bad_request(client, admin_headers, cursor):
+    response = client.get("/api/users", query_string={"cursor": cursor}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Cursor inválido"
+
+
+def test_composite_cursor_with_dates_and_enums(app, make_user):
+    for i in range(5):
+        make_user(f"user{i}@test.com", UserRole.estudiante if i % 2 else UserRole.paciente)
+    columns = [User.role, User.birth_day, User.id]
+    with app.app_context():
+        expected = db.session.scalars(select(User.id).order_by(*columns)).all()
+        ids, cursor = [], None
+        while True:
+            users, cursor = keyset_page(select(User), columns, db.session, 2, cursor)
+            ids.extend(user.id for user in users)
+            if cursor is None:
+                break
+        assert ids == expected
+
+        for values in (["otro", "1990-01-01", 1], [UserRole.paciente.value, "ayer", 1]):
+            with pytest.raises(APIException):
+                keyset_page(select(User), columns, db.session, 2, encode_cursor(values))
@@ -0,0 +1,47 @@
+"""
+Limite de /api/login (ip=20/minute,email=5/minute): 429 con Retry-After, y una
+solicitud rechazada por una regla no gasta los tokens de las demas.
+"""
+import pytest
+import api.rate_limit as rate_limit
+
+
+@pytest.fixture(autouse=True)
+def buckets(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    rate_limit.backend.clear()
+    yield
+    rate_limit.backend.clear()
+
+
+def _login(client, email):
+    return client.post("/api/login", json={"email": email, "password": "incorrecta"})
+
+
+def test_login_is_limited_per_email_with_retry_after(client, make_user):
+    make_user("victima@test.com")
+    for _ in range(5):
+        assert _login(client, "victima@test.com").status_code == 401
+
+    response = _login(client, "victima@test.com")
+    assert response.status_code == 429
+    assert response.get_json()["limit"] == "5/minute"
+    assert 1 <= int(response.headers["Retry-After"]) <= 60
+
+
+def test_rejected_attempts_do_not_drain_the_ip_bucket(client, make_user):
+    make_user("victima@test.com")
+    make_user("otra@test.com")
+    # 5 intentos gastan el email; los 30 siguientes los rechaza la regla del email
+    for _ in range(35):
+        _login(client, "victima@test.com")
+
+    # La IP solo gasto 5 de sus 20 tokens: otra cuenta sigue pudiendo intentar
+    for _ in range(5):
+        assert _login(client, "otra@test.com").status_code == 401
+
+
+def test_ip_bucket_still_limits_many_accounts(client):
+    statuses = [_login(client, f"usuario{i}@test.com").status_code for i in range(21)]
+    assert statuses[:20] == [401] * 20
+    assert statuses[20] == 429
@@ -0,0 +1,65 @@
+"""
+Manifiesto de archivos estaticos con auto_reload (desarrollo): cada solicitud
+revisa solo el archivo pedido y lo vuelve a leer si cambio.
+"""
+import os
+
+import pytest
+from api import static_assets
+from api.static_assets import StaticManifest
+
+
+def _write(root, path, content, mtime=None):
+    filename = os.path.join(root, path)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w") as output:
+        output.write(content)
+    if mtime is not None:
+        os.utime(filename, ns=(mtime, mtime))
+    return filename
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    _write(root, "index.html", "<html>v1</html>", mtime=1_000_000_000)
+    _write(root, "assets/app-abc12345.js", "console.log(1)")
+    manifest = StaticManifest(root, auto_reload=True)
+
+    # Despues de construirlo no se vuelve a recorrer el directorio
+    def walk(*args, **kwargs):
+        raise AssertionError("auto_reload no debe recorrer el directorio")
+    monkeypatch.setattr(static_assets.os, "walk", walk)
+    return manifest
+
+
+def test_unchanged_asset_is_not_rebuilt(manifest):
+    asset = manifest.get("index.html")
+    assert manifest.get("index.html") is asset
+    assert manifest.index() is asset
+
+
+def test_changed_asset_is_reloaded(manifest):
+    old = manifest.get("index.html")
+    _write(manifest.root, "index.html", "<html>v2</html>", mtime=2_000_000_000)
+    new = manifest.get("index.html")
+    assert new is not old and new.etag != old.etag
+
+    _write(manifest.root, "index.html.gz", "comprimido")
+    assert "gzip" in manifest.get("index.html").variants
+
+
+def test_new_and_deleted_files(manifest):
+    _write(manifest.root, "assets/new-def67890.css", "body {}")
+    asset = manifest.get("assets/new-def67890.css")
+    assert asset is not None and asset.immutable
+
+    os.remove(asset.filename)
+    assert manifest.get("assets/new-def67890.css") is None
+    assert "assets/new-def67890.css" not in manifest.assets
+
+
+def test_paths_outside_root_are_not_served(manifest):
+    _write(os.path.dirname(manifest.root), "secret.txt", "x")
+    assert manifest.get("../secret.txt") is None
+    assert manifest.get("index.html.gz") is None
@@ -0,0 +1,70 @@
+"""
+Concurrencia optimista de los expedientes: If-Match con un ETag que ya no es
+el vigente responde 409 con el ETag actual, y un UPDATE que pierde la carrera
+con otra escritura (StaleDataError) tambien es un 409.
+"""
+import pytest
+from sqlalchemy import update
+from api.models import db, MedicalFile, UserRole
+from api.utils import APIException
+from api.versioning import CONFLICT_MESSAGE, flush_or_conflict
+
+
+@pytest.fixture
+def medical_file(client, make_user, auth_headers, medical_file_payload):
+    admin_id = make_user("admin@test.com", UserRole.admin)
+    professional_id = make_user("pro@test.com", UserRole.profesional)
+    patient_id = make_user("pac@test.com")
+    headers = auth_headers(admin_id)
+    response = client.post("/api/medical-files/bulk", headers=headers,
+                           json=[medical_file_payload(patient_id, professional_id, professional_id)])
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["results"][0]["medical_file_id"], headers
+
+
+def _etag(client, file_id, headers):
+    response = client.get(f"/api/medical-file/{file_id}", headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.headers["ETag"]
+
+
+def test_if_match_mismatch_is_conflict(client, medical_file):
+    file_id, headers = medical_file
+    original = _etag(client, file_id, headers)
+
+    response = client.patch(f"/api/medical-file/{file_id}/family", json={"cancer": True},
+                            headers=dict(headers, **{"If-Match": original}))
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["changed"] == ["cancer"]
+    current = _etag(client, file_id, headers)
+    assert response.headers["ETag"] == current != original
+
+    # Otra edicion con el ETag viejo: 409 con el vigente y sin cambios
+    for method, url, body in (
+            ("patch", f"/api/medical-file/{file_id}/family", {"diabetes": False}),
+            ("put", f"/api/medical-file/{file_id}/status", {"status": "confirmado"})):
+        response = getattr(client, method)(url, json=body,
+                                           headers=dict(headers, **{"If-Match": original}))
+        assert response.status_code == 409
+        assert response.get_json() == {"message": CONFLICT_MESSAGE, "etag": current.strip('"')}
+    assert _etag(client, file_id, headers) == current
+
+    # Sin If-Match o con * la actualizacion procede
+    response = client.put(f"/api/medical-file/{file_id}/status", json={"status": "confirmado"},
+                          headers=dict(headers, **{"If-Match": "*"}))
+    assert response.status_code == 200, response.get_json()
+
+
+def test_stale_update_is_conflict(app, medical_file):
+    file_id, _ = medical_file
+    with app.app_context():
+        row = db.session.get(MedicalFile, file_id)
+        # Otra solicitud actualiza el expediente despues de que este lo leyo
+        db.session.execute(update(MedicalFile).where(MedicalFile.id == file_id)
+                           .values(version=MedicalFile.version + 1)
+                           .execution_options(synchronize_session=False))
+        row.supervised_by = None
+        with pytest.raises(APIException) as conflict:
+            flush_or_conflict()
+        assert conflict.value.status_code == 409
+        assert conflict.value.message == CONFLICT_MESSAGE